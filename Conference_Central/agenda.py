@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+
+"""agenda.py
+
+Conflict detection & schedule suggestion for a personal agenda.
+
+Both work on (start, end, item) intervals, half-open so a session ending
+at 10:00 doesn't clash with one starting at 10:00, and both are
+O(n log n): one sort, then a sweep for conflicts, or a sort by end time
+plus binary searches for the suggested schedule.
+
+"""
+
+import bisect
+from datetime import datetime, timedelta
+
+# assumed length of sessions with no duration
+DEFAULT_DURATION = 60
+
+
+def interval(start_date, start_time, duration, item):
+    """Return the (start, end, item) interval of a session, or None if it
+    has no date or start time."""
+    if not start_date or not start_time:
+        return None
+    start = datetime.combine(start_date, start_time)
+    minutes = duration if duration is not None else DEFAULT_DURATION
+    return start, start + timedelta(minutes=max(minutes, 0)), item
+
+
+def conflicts(intervals):
+    """Return the groups of overlapping intervals, each in start order.
+
+    A group is a run of intervals, in start order, each starting before
+    the latest end so far; any interval overlapping one in a group is in
+    that group.
+    """
+    groups = []
+    group = []
+    group_end = None
+    for iv in sorted(intervals, key=lambda iv: (iv[0], iv[1])):
+        if group and iv[0] < group_end:
+            group.append(iv)
+            group_end = max(group_end, iv[1])
+            continue
+        if len(group) > 1:
+            groups.append(group)
+        group = [iv]
+        group_end = iv[1]
+    if len(group) > 1:
+        groups.append(group)
+    return groups
+
+
+def _minutes(iv):
+    return (iv[1] - iv[0]).total_seconds() / 60
+
+
+def best(intervals, weight=None):
+    """Return a non-overlapping subset of intervals with the largest total
+    weight, in start order (weighted interval scheduling).
+
+    weight(interval) returns a pair, compared lexicographically; it
+    defaults to (1, length in minutes): as many sessions as possible,
+    then as much time in them as possible.
+    """
+    weight = weight or (lambda iv: (1, _minutes(iv)))
+    ivs = sorted(intervals, key=lambda iv: (iv[1], iv[0]))
+    ends = [iv[1] for iv in ivs]
+
+    # totals[j]: best weight using the first j intervals by end time
+    totals = [(0, 0)]
+    for j, iv in enumerate(ivs):
+        # intervals ending at or before this one starts
+        p = bisect.bisect_right(ends, iv[0], 0, j)
+        w = weight(iv)
+        take = tuple(a + b for a, b in zip(totals[p], w))
+        totals.append(max(take, totals[j]))
+
+    chosen = []
+    j = len(ivs)
+    while j:
+        iv = ivs[j - 1]
+        p = bisect.bisect_right(ends, iv[0], 0, j - 1)
+        if tuple(a + b for a, b in zip(totals[p], weight(iv))) >= totals[j - 1]:
+            chosen.append(iv)
+            j = p
+        else:
+            j -= 1
+    chosen.reverse()
+    return chosen
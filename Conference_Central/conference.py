@@ -13,6 +13,7 @@ created by wesc on 2014 apr 21
 __author__ = 'wesc+api@google.com (Wesley Chun)'
 
 
+import csv
 from datetime import datetime
 
 import endpoints
@@ -22,20 +23,36 @@ from protorpc import messages
 from protorpc import message_types
 from protorpc import remote
 
+from google.appengine.api import app_identity
 from google.appengine.api import memcache
 from google.appengine.api import taskqueue
+from google.appengine.datastore.datastore_query import Cursor
 from google.appengine.ext import ndb
+from google.appengine.ext.ndb.stats import KindStat
 
 from models import ConflictException
 from models import Profile, ProfileMiniForm, ProfileForm
+from models import Registration, WishlistEntry
+from models import AttendeeForm, AttendeeForms
 from models import BooleanMessage
 from models import Conference, ConferenceForm, ConferenceForms
-from models import ConferenceQueryForm, ConferenceQueryForms
+from models import ConferenceQueryForm, ConferenceQueryForms, QueryPlanForm
 from models import Session, SessionForm, SessionForms
+from models import ScheduleForm
+from models import AgendaForm, ConflictForm
 from models import TeeShirtSize
 from models import StringMessage
 
 from utils import getUserId
+from converters import copyToForm
+import seats
+import schedule
+import agenda
+import speakers
+import responsecache
+import queryplanner
+import fieldstats
+from displaynames import getDisplayName, getDisplayNames, setDisplayName
 
 from settings import WEB_CLIENT_ID
 
@@ -43,6 +60,20 @@ EMAIL_SCOPE = endpoints.EMAIL_SCOPE
 API_EXPLORER_CLIENT_ID = endpoints.API_EXPLORER_CLIENT_ID
 MEMCACHE_ANNOUNCEMENTS_KEY = "RECENT_ANNOUNCEMENTS"
 MEMCACHE_FEATURED_KEY = "FEATURED_SPEAKER"
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+# requests carrying this header get debug logging on the hot paths
+DEBUG_HEADER = "X-Conference-Debug"
+EXPORT_BATCH_SIZE = 500
+QUERY_CACHE_TTL = 5 * 60
+# bounds on the in-memory part of queryConferences & querySessions
+RESIDUAL_BATCH_SIZE = 100
+MAX_SCAN = 1000
+STREAM_BATCH_SIZE = 200
+SESSION_ORDER = ('date', 'startTime')
+SESSION_EQUALITY_FIELDS = ('speaker', 'typeOfSession')
+MEMCACHE_CONFERENCE_COUNT_KEY = "CONFERENCE_COUNT"
+COUNT_LIMIT = 10000
 
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
@@ -70,6 +101,41 @@ FIELDS =    {
             'MAX_ATTENDEES': 'maxAttendees',
             }
 
+PROFILE_TRANSFORMS = {
+    'teeShirtSize': lambda size: getattr(TeeShirtSize, size),
+}
+
+# endpoints whose responses are kept in responsecache
+CACHED_ENDPOINTS = (
+    'getConference',
+    'getConferenceSessions',
+    'getSessionsBySpeaker',
+    'getSessionsByDate',
+    'getSessionsByTime',
+    'queryConferences',
+)
+
+CONFERENCE_TRANSFORMS = {
+    'startDate': str,
+    'endDate': str,
+}
+
+SESSION_TRANSFORMS = {
+    'date': str,
+    'startTime': str,
+}
+
+# list views: view=summary returns only the columns list pages show,
+# read with projection queries (see index.yaml)
+VIEWS = (None, 'full', 'summary')
+
+CONFERENCE_SUMMARY_PROJECTION = ('name', 'city', 'startDate',
+                                 'maxAttendees', 'seatsAvailable')
+CONFERENCE_SUMMARY_FIELDS = CONFERENCE_SUMMARY_PROJECTION + (
+    'organizerDisplayName',)
+
+SESSION_SUMMARY_FIELDS = ('name', 'speaker', 'date', 'startTime')
+
 CONF_GET_REQUEST = endpoints.ResourceContainer(
     message_types.VoidMessage,
     websafeConferenceKey=messages.StringField(1),
@@ -83,6 +149,17 @@ CONF_POST_REQUEST = endpoints.ResourceContainer(
 SESH_GET_REQUEST = endpoints.ResourceContainer(
     message_types.VoidMessage,
     websafeConferenceKey=messages.StringField(1),
+    view=messages.StringField(2),
+)
+
+SESSIONS_GET_REQUEST = endpoints.ResourceContainer(
+    message_types.VoidMessage,
+    view=messages.StringField(1),
+    pageSize=messages.IntegerField(2, variant=messages.Variant.INT32),
+    pageToken=messages.StringField(3),
+    startDate=messages.StringField(4),
+    endDate=messages.StringField(5),
+    typeOfSession=messages.StringField(6),
 )
 
 SESH_POST_REQUEST = endpoints.ResourceContainer(
@@ -90,10 +167,29 @@ SESH_POST_REQUEST = endpoints.ResourceContainer(
     websafeConferenceKey=messages.StringField(1),
 )
 
+SESSIONS_POST_REQUEST = endpoints.ResourceContainer(
+    SessionForms,
+    websafeConferenceKey=messages.StringField(1),
+)
+
+SESSION_QUERY_REQUEST = endpoints.ResourceContainer(
+    message_types.VoidMessage,
+    websafeConferenceKey=messages.StringField(1),
+    speaker=messages.StringField(2),
+    typeOfSession=messages.StringField(3),
+    startDate=messages.StringField(4),
+    endDate=messages.StringField(5),
+    startTimeFrom=messages.StringField(6),
+    startTimeTo=messages.StringField(7),
+    pageSize=messages.IntegerField(8, variant=messages.Variant.INT32),
+    pageToken=messages.StringField(9),
+)
+
 SESH_QUERY_REQUEST = endpoints.ResourceContainer(
     message_types.VoidMessage,
     websafeConferenceKey=messages.StringField(1),
     typeOfSession=messages.StringField(2),
+    typesOfSession=messages.StringField(3, repeated=True),
 )
 
 SPEAKER_QUERY_REQUEST = endpoints.ResourceContainer(
@@ -111,10 +207,42 @@ DATE_QUERY_REQUEST = endpoints.ResourceContainer(
     date=messages.StringField(1),
 )
 
+ATTENDEES_GET_REQUEST = endpoints.ResourceContainer(
+    message_types.VoidMessage,
+    websafeConferenceKey=messages.StringField(1),
+    pageSize=messages.IntegerField(2, variant=messages.Variant.INT32),
+    pageToken=messages.StringField(3),
+)
+
+FEATURED_GET_REQUEST = endpoints.ResourceContainer(
+    message_types.VoidMessage,
+    websafeConferenceKey=messages.StringField(1),
+)
+
 STARTTIME_QUERY_REQUEST = endpoints.ResourceContainer(
     message_types.VoidMessage,
     startTime=messages.StringField(1),
 )
+
+def _refId(key):
+    """Return a compact string id naming the Conference/Session key, for
+    the Registration & WishlistEntry that point at it.
+
+    Much shorter than key.urlsafe() (no app id, kinds or base64), which
+    keeps those entities' keys & index rows small.
+    """
+    return u':'.join(unicode(part) for part in key.flat()[1::2])
+
+def _agendaOrder(sesh):
+    """Sort key putting Sessions in the datastore's date, startTime order.
+
+    Every endpoint listing sessions in time order uses it, so undated or
+    untimed sessions always sort first, as None does in the datastore;
+    comparing a date or time with None raises in Python 2.
+    """
+    return (sesh.date is not None, sesh.date,
+            sesh.startTime is not None, sesh.startTime)
+
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 
 
@@ -124,20 +252,37 @@ STARTTIME_QUERY_REQUEST = endpoints.ResourceContainer(
 class ConferenceApi(remote.Service):
     """Conference API v0.1"""
 
+# - - - Debug logging - - - - - - - - - - - - - - - - - - - -
+
+    def _debugEnabled(self):
+        """Return True if the current request asked for debug logging."""
+        try:
+            return self._debug
+        except AttributeError:
+            state = getattr(self, 'request_state', None)
+            self._debug = bool(state and state.headers.get(DEBUG_HEADER))
+            return self._debug
+
+
+    def _debugLog(self, msg, *args):
+        """Log msg % args at debug level if the request asked for it."""
+        if self._debugEnabled():
+            logging.debug(msg, *args)
+
 # - - - Profile objects - - - - - - - - - - - - - - - - - - -
 
     def _copyProfileToForm(self, prof):
         """Copy relevant fields from Profile to ProfileForm."""
-        # copy relevant fields from Profile to ProfileForm
-        pf = ProfileForm()
-        for field in pf.all_fields():
-            if hasattr(prof, field.name):
-                # convert t-shirt string to Enum; just copy others
-                if field.name == 'teeShirtSize':
-                    setattr(pf, field.name, getattr(TeeShirtSize, getattr(prof, field.name)))
-                else:
-                    setattr(pf, field.name, getattr(prof, field.name))
-        pf.check_initialized()
+        # convert t-shirt string to Enum; just copy others
+        pf = copyToForm(prof, ProfileForm, PROFILE_TRANSFORMS)
+
+        # registrations & wishlist live in their own child entities
+        regs = Registration.query(ancestor=prof.key).fetch_async()
+        entries = WishlistEntry.query(ancestor=prof.key).fetch_async()
+        pf.conferenceKeysToAttend = [reg.conference.urlsafe()
+                                     for reg in regs.get_result()]
+        pf.sessionsToWishlist = [entry.session.urlsafe()
+                                 for entry in entries.get_result()]
         return pf
 
 
@@ -161,6 +306,9 @@ class ConferenceApi(remote.Service):
                 teeShirtSize = str(TeeShirtSize.NOT_SPECIFIED),
             )
             profile.put()
+        elif profile.conferenceKeysToAttend or profile.sessionsToWishlist:
+            # move pre-Registration lists into their own entities first
+            profile = self._migrateProfile(p_key)
 
         return profile      # return Profile
 
@@ -172,6 +320,7 @@ class ConferenceApi(remote.Service):
 
         # if saveProfile(), process user-modifyable fields
         if save_request:
+            oldName = prof.displayName
             for field in ('displayName', 'teeShirtSize'):
                 if hasattr(save_request, field):
                     val = getattr(save_request, field)
@@ -182,6 +331,12 @@ class ConferenceApi(remote.Service):
                         else:
                             setattr(prof, field, val)
             prof.put()
+            if prof.displayName != oldName:
+                setDisplayName(prof.key.id(), prof.displayName)
+                # fan the new name out to the user's Conferences
+                taskqueue.add(params={'userId': prof.key.id()},
+                    url='/tasks/update_organizer_name'
+                )
 
         # return ProfileForm
         return self._copyProfileToForm(prof)
@@ -202,79 +357,95 @@ class ConferenceApi(remote.Service):
 
 # - - - Conference objects - - - - - - - - - - - - - - - - -
 
-    def _copyConferenceToForm(self, conf, displayName):
-        """Copy relevant fields from Conference to ConferenceForm."""
-        cf = ConferenceForm()
-        for field in cf.all_fields():
-            if hasattr(conf, field.name):
-                # convert Date to date string; just copy others
-                if field.name.endswith('Date'):
-                    setattr(cf, field.name, str(getattr(conf, field.name)))
-                else:
-                    setattr(cf, field.name, getattr(conf, field.name))
-            elif field.name == "websafeKey":
-                setattr(cf, field.name, conf.key.urlsafe())
+    def _copyConferenceToForm(self, conf, displayName, fields=None):
+        """Copy relevant fields (or only fields) from Conference to ConferenceForm."""
+        # convert Date to date string; just copy others
+        cf = copyToForm(conf, ConferenceForm, CONFERENCE_TRANSFORMS,
+                        key_field='websafeKey', fields=fields)
         if displayName:
             setattr(cf, 'organizerDisplayName', displayName)
-        cf.check_initialized()
         return cf
 
 
     def _createConferenceObject(self, request):
         """Create or update Conference object, returning ConferenceForm/request."""
+        return self._createConferenceObjects([request])[0]
+
+
+    def _createConferenceObjects(self, requests):
+        """Create Conference objects in bulk, returning ConferenceForms/requests.
+
+        IDs are allocated in one call, the Conferences written with one
+        put_multi and the confirmation emails enqueued in batched adds.
+        """
         # preload necessary data items
         user = endpoints.get_current_user()
         if not user:
             raise endpoints.UnauthorizedException('Authorization required')
         user_id = getUserId(user)
 
-        if not request.name:
-            raise endpoints.BadRequestException("Conference 'name' field required")
-
-        # copy ConferenceForm/ProtoRPC Message into dict
-        data = {field.name: getattr(request, field.name) for field in request.all_fields()}
-        del data['websafeKey']
-        del data['organizerDisplayName']
-
-        # add default values for those missing (both data model & outbound Message)
-        for df in DEFAULTS:
-            if data[df] in (None, []):
-                data[df] = DEFAULTS[df]
-                setattr(request, df, DEFAULTS[df])
-
-        # convert dates from strings to Date objects; set month based on start_date
-        if data['startDate']:
-            data['startDate'] = datetime.strptime(data['startDate'][:10], "%Y-%m-%d").date()
-            data['month'] = data['startDate'].month
-        else:
-            data['month'] = 0
-        if data['endDate']:
-            data['endDate'] = datetime.strptime(data['endDate'][:10], "%Y-%m-%d").date()
+        for request in requests:
+            if not request.name:
+                raise endpoints.BadRequestException("Conference 'name' field required")
+        if not requests:
+            return []
 
-        # set seatsAvailable to be same as maxAttendees on creation
-        if data["maxAttendees"] > 0:
-            data["seatsAvailable"] = data["maxAttendees"]
         # generate Profile Key based on user ID and Conference
-        # ID based on Profile key get Conference key from ID
+        # IDs based on Profile key get Conference keys from IDs
         p_key = ndb.Key(Profile, user_id)
-        c_id = Conference.allocate_ids(size=1, parent=p_key)[0]
-        c_key = ndb.Key(Conference, c_id, parent=p_key)
-        data['key'] = c_key
-        data['organizerUserId'] = request.organizerUserId = user_id
-
-        # TODO 2: add confirmation email sending task to queue
-        # create Conference, send email to organizer confirming
-        # creation of Conference & return (modified) ConferenceForm
-        Conference(**data).put()
-        taskqueue.add(params={'email': user.email(),
-            'conferenceInfo': repr(request)},
-            url='/tasks/send_confirmation_email'
-        )
-
-        return request
+        first, last = Conference.allocate_ids(size=len(requests), parent=p_key)
+        displayName = getDisplayName(user_id)
+
+        confs = []
+        tasks = []
+        for c_id, request in zip(xrange(first, last + 1), requests):
+            # copy ConferenceForm/ProtoRPC Message into dict
+            data = {field.name: getattr(request, field.name) for field in request.all_fields()}
+            del data['websafeKey']
+
+            # add default values for those missing (both data model & outbound Message)
+            for df in DEFAULTS:
+                if data[df] in (None, []):
+                    data[df] = DEFAULTS[df]
+                    setattr(request, df, DEFAULTS[df])
+
+            # convert dates from strings to Date objects; set month based on start_date
+            if data['startDate']:
+                data['startDate'] = datetime.strptime(data['startDate'][:10], "%Y-%m-%d").date()
+                data['month'] = data['startDate'].month
+            else:
+                data['month'] = 0
+            if data['endDate']:
+                data['endDate'] = datetime.strptime(data['endDate'][:10], "%Y-%m-%d").date()
+
+            # set seatsAvailable to be same as maxAttendees on creation
+            if data["maxAttendees"] > 0:
+                data["seatsAvailable"] = data["maxAttendees"]
+            c_key = ndb.Key(Conference, c_id, parent=p_key)
+            data['key'] = c_key
+            request.websafeKey = c_key.urlsafe()
+            data['organizerUserId'] = request.organizerUserId = user_id
+            # store organizer's displayName so listings needn't join on Profile
+            data['organizerDisplayName'] = request.organizerDisplayName = displayName
+
+            confs.append(Conference(**data))
+            tasks.append(taskqueue.Task(params={'email': user.email(),
+                'conferenceInfo': repr(request)},
+                url='/tasks/send_confirmation_email'
+            ))
+
+        # create Conferences, send email to organizer confirming
+        # creation of each Conference & return (modified) ConferenceForms
+        ndb.put_multi(confs)
+        responsecache.bump(responsecache.CONFERENCES_SCOPE)
+        queue = taskqueue.Queue()
+        for i in xrange(0, len(tasks), taskqueue.MAX_TASKS_PER_ADD):
+            queue.add(tasks[i:i + taskqueue.MAX_TASKS_PER_ADD])
+
+        return requests
 
 
-    @ndb.transactional()
+    @ndb.transactional(xg=True)
     def _updateConferenceObject(self, request):
         user = endpoints.get_current_user()
         if not user:
@@ -298,7 +469,12 @@ class ConferenceApi(remote.Service):
 
         # Not getting all the fields, so don't create a new object; just
         # copy relevant fields from ConferenceForm to Conference object
+        oldMax = conf.maxAttendees or 0
         for field in request.all_fields():
+            # organizerDisplayName is kept in step with the Profile,
+            # seatsAvailable by the seat counter
+            if field.name in ('organizerDisplayName', 'seatsAvailable'):
+                continue
             data = getattr(request, field.name)
             # only copy fields where we get data
             if data not in (None, []):
@@ -309,9 +485,19 @@ class ConferenceApi(remote.Service):
                         conf.month = data.month
                 # write to Conference object
                 setattr(conf, field.name, data)
+        if conf.organizerDisplayName is None:
+            conf.organizerDisplayName = getDisplayName(user_id)
+
+        # hand capacity changes on to the seat counter, which refuses
+        # cuts below the number already registered
+        delta = (conf.maxAttendees or 0) - oldMax
+        if delta:
+            total = seats.resize(conf.key, delta)
+            if total is None:
+                total = seats.newTotal(conf.seatsAvailable or 0, delta)
+            conf.seatsAvailable = total
         conf.put()
-        prof = ndb.Key(Profile, user_id).get()
-        return self._copyConferenceToForm(conf, getattr(prof, 'displayName'))
+        return self._copyConferenceToForm(conf, None)
 
 
     @endpoints.method(ConferenceForm, ConferenceForm, path='conference',
@@ -321,12 +507,25 @@ class ConferenceApi(remote.Service):
         return self._createConferenceObject(request)
 
 
+    @endpoints.method(ConferenceForms, ConferenceForms, path='conferences',
+            http_method='POST', name='createConferences')
+    def createConferences(self, request):
+        """Create several new conferences at once."""
+        return ConferenceForms(
+            items=self._createConferenceObjects(list(request.items))
+        )
+
+
     @endpoints.method(CONF_POST_REQUEST, ConferenceForm,
             path='conference/{websafeConferenceKey}',
             http_method='PUT', name='updateConference')
     def updateConference(self, request):
         """Update conference w/provided fields & return w/updated info."""
-        return self._updateConferenceObject(request)
+        cf = self._updateConferenceObject(request)
+        # only invalidate once the transaction has committed
+        responsecache.bump(responsecache.conferenceScope(cf.websafeKey),
+                           responsecache.CONFERENCES_SCOPE)
+        return cf
 
 
     @endpoints.method(CONF_GET_REQUEST, ConferenceForm,
@@ -334,14 +533,20 @@ class ConferenceApi(remote.Service):
             http_method='GET', name='getConference')
     def getConference(self, request):
         """Return requested conference (by websafeConferenceKey)."""
-        # get Conference object from request; bail if not found
-        conf = ndb.Key(urlsafe=request.websafeConferenceKey).get()
-        if not conf:
-            raise endpoints.NotFoundException(
-                'No conference found with key: %s' % request.websafeConferenceKey)
-        prof = conf.key.parent().get()
-        # return ConferenceForm
-        return self._copyConferenceToForm(conf, getattr(prof, 'displayName'))
+        c_key = ndb.Key(urlsafe=request.websafeConferenceKey)
+        wsck = c_key.urlsafe()
+
+        def build():
+            # get Conference object from request; bail if not found
+            conf = c_key.get()
+            if not conf:
+                raise endpoints.NotFoundException(
+                    'No conference found with key: %s' % request.websafeConferenceKey)
+            # return ConferenceForm
+            return self._copyConferenceToForm(*self._withDisplayNames([conf])[0])
+
+        return responsecache.cached('getConference',
+            [responsecache.conferenceScope(wsck)], wsck, ConferenceForm, build)
 
 
     @endpoints.method(message_types.VoidMessage, ConferenceForms,
@@ -355,18 +560,18 @@ class ConferenceApi(remote.Service):
             raise endpoints.UnauthorizedException('Authorization required')
         user_id =  getUserId(user)
         # create ancestor query for all key matches for this user
-        confs = Conference.query(ancestor=ndb.Key(Profile, user_id))
-        prof = ndb.Key(Profile, user_id).get()
+        confs = Conference.query(ancestor=ndb.Key(Profile, user_id)).fetch()
         # return set of ConferenceForm objects per Conference
         return ConferenceForms(
-            items=[self._copyConferenceToForm(conf, getattr(prof, 'displayName')) for conf in confs]
+            items=[self._copyConferenceToForm(conf, name) for conf, name in \
+            self._withDisplayNames(confs)]
         )
 
 
-    def _getQuery(self, request):
-        """Return formatted query from the submitted filters."""
+    def _getQuery(self, query_plan):
+        """Return formatted query for the datastore part of a QueryPlan."""
         q = Conference.query()
-        inequality_filter, filters = self._formatFilters(request.filters)
+        inequality_filter = query_plan.inequality_field
 
         # If exists, sort on inequality filter first
         if not inequality_filter:
@@ -375,9 +580,11 @@ class ConferenceApi(remote.Service):
             q = q.order(ndb.GenericProperty(inequality_filter))
             q = q.order(Conference.name)
 
-        for filtr in filters:
-            if filtr["field"] in ["month", "maxAttendees"]:
-                filtr["value"] = int(filtr["value"])
+        # '!=' runs as a merge of two queries, which can only produce
+        # cursors when ordered by key last
+        q = q.order(Conference.key)
+
+        for filtr in query_plan.datastore_filters:
             formatted_query = ndb.query.FilterNode(filtr["field"], filtr["operator"], filtr["value"])
             q = q.filter(formatted_query)
         return q
@@ -386,7 +593,6 @@ class ConferenceApi(remote.Service):
     def _formatFilters(self, filters):
         """Parse, check validity and format user supplied filters."""
         formatted_filters = []
-        inequality_field = None
 
         for f in filters:
             filtr = {field.name: getattr(f, field.name) for field in f.all_fields()}
@@ -397,18 +603,170 @@ class ConferenceApi(remote.Service):
             except KeyError:
                 raise endpoints.BadRequestException("Filter contains invalid field or operator.")
 
-            # Every operation except "=" is an inequality
-            if filtr["operator"] != "=":
-                # check if inequality operation has been used in previous filters
-                # disallow the filter if inequality was performed on a different field before
-                # track the field on which the inequality operation is performed
-                if inequality_field and inequality_field != filtr["field"]:
-                    raise endpoints.BadRequestException("Inequality filter is allowed on only one field.")
-                else:
-                    inequality_field = filtr["field"]
+            # normalise values so equivalent filters compare equal
+            if filtr["field"] in ["month", "maxAttendees"]:
+                try:
+                    filtr["value"] = int(filtr["value"])
+                except (TypeError, ValueError):
+                    raise endpoints.BadRequestException("Filter value must be a number.")
+            elif filtr["value"] is not None:
+                filtr["value"] = filtr["value"].strip()
 
             formatted_filters.append(filtr)
-        return (inequality_field, formatted_filters)
+        return formatted_filters
+
+
+    def _fetchPage(self, q, query_plan, page_size, cursor, keys_only=True):
+        """Run query q for a QueryPlan, returning (keys or entities, next
+        page token).
+
+        Inequalities on other fields than the pushed one are checked in
+        memory, scanning at most MAX_SCAN entities per page; a page can
+        come back short (or, rarely, empty), with a token to carry on
+        scanning.
+        """
+        if not query_plan.residual:
+            results, next_cursor, more = q.fetch_page(
+                page_size, start_cursor=cursor, keys_only=keys_only)
+            return results, next_cursor.urlsafe() if more and next_cursor else None
+
+        results = []
+        scanned = 0
+        while True:
+            # one iterator per batch, limited to it: an unlimited ndb
+            # iterator keeps fetching batches to the end of the query
+            limit = min(RESIDUAL_BATCH_SIZE, MAX_SCAN - scanned)
+            it = q.iter(start_cursor=cursor, limit=limit, batch_size=limit,
+                        produce_cursors=True)
+            fetched = 0
+            for entity in it:
+                fetched += 1
+                if query_plan.matches(entity):
+                    results.append(entity.key if keys_only else entity)
+                if len(results) == page_size:
+                    break
+            scanned += fetched
+            if fetched < limit and not it.has_next():
+                # the query has run out
+                return results, None
+            cursor = it.cursor_after()
+            if len(results) == page_size or scanned == MAX_SCAN:
+                return results, cursor.urlsafe()
+
+
+    def _canonicalFilters(self, filters):
+        """Return formatted filters as a sorted tuple, for cache keys."""
+        return tuple(sorted((filtr["field"], filtr["operator"], filtr["value"])
+                            for filtr in filters))
+
+
+    def _getPageArgs(self, request, token=None):
+        """Return (page size, start cursor) from the submitted paging fields
+        (or from token, if given, instead of the submitted pageToken)."""
+        page_size = request.pageSize or DEFAULT_PAGE_SIZE
+        if page_size < 1:
+            raise endpoints.BadRequestException("'pageSize' must be positive.")
+        page_size = min(page_size, MAX_PAGE_SIZE)
+
+        if token is None:
+            token = request.pageToken
+        cursor = None
+        if token:
+            try:
+                cursor = Cursor(urlsafe=token)
+            except Exception:
+                raise endpoints.BadRequestException("Invalid 'pageToken'.")
+        return page_size, cursor
+
+
+    def _getPlannedPageArgs(self, request):
+        """Return (page size, start cursor, pushed field) for a query run
+        through queryplanner.
+
+        Its page tokens are "field:cursor" (see _plannedPageToken), so
+        every page pushes the same field & keeps the same sort order even
+        if the field stats change in between; urlsafe cursors have no ':'.
+        """
+        pushed, _, token = (request.pageToken or '').rpartition(':')
+        page_size, cursor = self._getPageArgs(request, token)
+        return page_size, cursor, pushed or None
+
+
+    def _plan(self, filters, model_cls, pushed=None, tiebreak=('name',)):
+        """Return the QueryPlan for formatted filters on model_cls.
+
+        Field stats are only read when there are inequalities on several
+        fields to choose between.
+        """
+        fields = set(filtr["field"] for filtr in filters
+                     if filtr["operator"] != '=')
+        stats = fieldstats.get(model_cls) if len(fields) > 1 else None
+        return queryplanner.plan(filters, tiebreak, stats, pushed)
+
+
+    def _plannedPageToken(self, query_plan, token):
+        """Return the page token for a cursor token from a QueryPlan."""
+        if token and query_plan.inequality_field:
+            return '%s:%s' % (query_plan.inequality_field, token)
+        return token
+
+
+    def _withDisplayNames(self, confs):
+        """Pair each Conference with the organizer displayName to show.
+
+        Conferences carry a denormalized organizerDisplayName; only ones
+        stored before it existed fall back to the display name cache.
+        The name is None where the Conference already has it.
+        """
+        legacy = [conf.key.parent().id() for conf in confs
+                  if conf.organizerDisplayName is None]
+        names = getDisplayNames(legacy) if legacy else {}
+        return [(conf, names.get(conf.key.parent().id())) for conf in confs]
+
+
+    def _getConferencesWithNames(self, conf_keys):
+        """Fetch Conferences by key & pair them with organizer displayNames."""
+        confs = [conf for conf in ndb.get_multi(conf_keys) if conf]
+        return self._withDisplayNames(confs)
+
+
+    @staticmethod
+    def _conferenceCount():
+        """Return a (possibly stale) count of all Conferences."""
+        count = memcache.get(MEMCACHE_CONFERENCE_COUNT_KEY)
+        if count is None:
+            stat = KindStat.query(KindStat.kind_name == 'Conference').get()
+            if stat:
+                count = stat.count
+            else:
+                count = Conference.query().count(limit=COUNT_LIMIT)
+            memcache.set(MEMCACHE_CONFERENCE_COUNT_KEY, count, time=60 * 60)
+        return count
+
+
+    def _explain(self, query_plan, page_size):
+        """Describe how queryConferences would run a QueryPlan."""
+        def describe(filters):
+            return ['%s %s %s' % (filtr["field"], filtr["operator"], filtr["value"])
+                    for filtr in filters]
+
+        matches = int(self._conferenceCount() * query_plan.selectivity)
+        if query_plan.residual:
+            # scan until page_size pass the in-memory filters
+            residual = query_plan.residual_selectivity
+            scanned = min(int(page_size / residual), MAX_SCAN, matches)
+        else:
+            scanned = min(page_size, matches)
+
+        index = query_plan.index
+        return QueryPlanForm(
+            datastoreFilters=describe(query_plan.datastore_filters),
+            residualFilters=describe(query_plan.residual),
+            orderBy=query_plan.order,
+            index=queryplanner.indexYaml(index) if index else None,
+            estimatedMatches=matches,
+            estimatedScanned=scanned,
+        )
 
 
     @endpoints.method(ConferenceQueryForms, ConferenceForms,
@@ -416,23 +774,66 @@ class ConferenceApi(remote.Service):
             http_method='POST',
             name='queryConferences')
     def queryConferences(self, request):
-        """Query for conferences."""
-        conferences = self._getQuery(request)
+        """Query for conferences, one page at a time."""
+        page_size, cursor, pushed = self._getPlannedPageArgs(request)
+        filters = self._formatFilters(request.filters)
+        summary = self._isSummaryView(request.view)
+        if request.explain:
+            query_plan = queryplanner.plan(
+                filters, stats=fieldstats.get(Conference), pushed=pushed)
+            return ConferenceForms(plan=self._explain(query_plan, page_size))
+        if summary and not filters:
+            return self._conferenceSummaries(page_size, cursor)
+
+        def build():
+            # run the query once, keys only where it needs no filtering
+            query_plan = self._plan(filters, Conference, pushed)
+            conf_keys, token = self._fetchPage(
+                self._getQuery(query_plan), query_plan, page_size, cursor)
+            return conf_keys, self._plannedPageToken(query_plan, token)
+
+        # the same few filter combinations come up again and again, so
+        # cache the matching keys & hydrate them with get_multi, which
+        # ndb's own cache can often serve
+        conf_keys, next_token = responsecache.cachedValue('queryConferences',
+            [responsecache.CONFERENCES_SCOPE],
+            (self._canonicalFilters(filters), page_size, request.pageToken),
+            build, ttl=QUERY_CACHE_TTL)
 
-        # need to fetch organiser displayName from profiles
-        # get all keys and use get_multi for speed
-        organisers = [(ndb.Key(Profile, conf.organizerUserId)) for conf in conferences]
-        profiles = ndb.get_multi(organisers)
+        # return individual ConferenceForm object per Conference
+        fields = CONFERENCE_SUMMARY_FIELDS if summary else None
+        return ConferenceForms(
+                items=[self._copyConferenceToForm(conf, name, fields) for conf, name in \
+                self._getConferencesWithNames(conf_keys)],
+                nextPageToken=next_token
+        )
 
-        # put display names in a dict for easier fetching
-        names = {}
-        for profile in profiles:
-            names[profile.key.id()] = profile.displayName
 
-        # return individual ConferenceForm object per Conference
+    def _isSummaryView(self, view):
+        """Check a list endpoint's view parameter; True for summary."""
+        if view not in VIEWS:
+            raise endpoints.BadRequestException(
+                "'view' must be 'full' or 'summary'.")
+        return view == 'summary'
+
+
+    def _conferenceSummaries(self, page_size, cursor):
+        """Return a page of summary ConferenceForms for the unfiltered
+        listing, read with a projection query.
+
+        organizerDisplayName isn't indexed, so it comes from the display
+        name cache instead of the projection.
+        """
+        confs, next_cursor, more = Conference.query().order(Conference.name)\
+            .fetch_page(page_size, start_cursor=cursor,
+                        projection=CONFERENCE_SUMMARY_PROJECTION)
+        names = getDisplayNames([conf.key.parent().id() for conf in confs])
         return ConferenceForms(
-                items=[self._copyConferenceToForm(conf, names[conf.organizerUserId]) for conf in \
-                conferences]
+            items=[self._copyConferenceToForm(conf,
+                       names.get(conf.key.parent().id()),
+                       CONFERENCE_SUMMARY_PROJECTION)
+                   for conf in confs],
+            nextPageToken=next_cursor.urlsafe() if more and next_cursor else None
         )
 
 # - - - Session objects - - - - - - - - - - - - - - - - -
@@ -440,22 +841,12 @@ class ConferenceApi(remote.Service):
 #  ------------
 #  |  TASK 1  |
 #  ------------
-    def _copySessionToForm(self, sesh):
-        """Copy relevant fields from Session to SessionForm"""
-        sf = SessionForm()
-        for field in sf.all_fields():
-            if hasattr(sesh, field.name):
-                # convert Time or Date to date string; just copy others
-                if field.name.endswith(('startTime', 'date')):
-                    setattr(sf, field.name, str(getattr(sesh, field.name)))
-                else:
-                    setattr(sf, field.name, getattr(sesh, field.name))
-            elif field.name == "seshWebSafeKey":
-                setattr(sf, field.name, sesh.key.urlsafe())
-
-        sf.check_initialized()
-
-        print sf
+    def _copySessionToForm(self, sesh, fields=None):
+        """Copy relevant fields (or only fields) from Session to SessionForm"""
+        # convert Time or Date to date string; just copy others
+        sf = copyToForm(sesh, SessionForm, SESSION_TRANSFORMS,
+                        key_field='seshWebSafeKey', fields=fields)
+        self._debugLog('Session form: %s', sf)
         return sf
 
 #  ------------
@@ -463,22 +854,30 @@ class ConferenceApi(remote.Service):
 #  ------------
     def _createSessionObject(self, request):
         """Create or update Session Object, returning SessionForm/request"""
+        if not request.websafeConferenceKey:
+            raise endpoints.BadRequestException("Session 'websafeConferenceKey' field required")
+
+        return self._createSessionObjects(request.websafeConferenceKey, [request])[0]
+
+    def _createSessionObjects(self, wsck, requests):
+        """Create Session Objects in bulk under one conference, returning
+        SessionForms. Ownership is checked once, IDs allocated in one call
+        and one featured speaker check is scheduled per distinct speaker.
+        """
         # preload necessary data items
         user = endpoints.get_current_user()
         if not user:
             raise endpoints.UnauthorizedException('endpoints.get_current_user() failed. Authorization required')
         user_id = getUserId(user)
 
-        if not request.name:
-            raise endpoints.UnauthorizedException("Session 'name' field required")
+        for request in requests:
+            if not request.name:
+                raise endpoints.UnauthorizedException("Session 'name' field required")
 
-        if not request.websafeConferenceKey:
-            raise endpoints.BadRequestException("Session 'websafeConferenceKey' field required")
-        
         # check if conf exists given websafeConfKey
         # get conference; check that it exists
-        wsck = request.websafeConferenceKey
-        conf = ndb.Key(urlsafe=wsck).get()
+        c_key = ndb.Key(urlsafe=wsck)
+        conf = c_key.get()
         if not conf:
             raise endpoints.NotFoundException(
                 'No conference found with key: %s' % wsck)
@@ -488,46 +887,53 @@ class ConferenceApi(remote.Service):
             raise endpoints.ForbiddenException(
                 'Only the owner can add sessions.')
 
-        # copy SessionForm/ProtoRPC Message into dict
-        data = {field.name: getattr(request, field.name) for field in request.all_fields()}
-        del data['seshWebSafeKey']
-        del data['websafeConferenceKey']
-
-        # Convert dates from strings to Date objects; 
-        if data['date']:
-            data['date'] = datetime.strptime(data['date'][:10], "%Y-%m-%d").date()
-        # Convert times from strings to time objects; 
-        if data['startTime']:
-            data['startTime'] = datetime.strptime(data['startTime'][:5], "%H:%M").time()
-        
-        # define session ancestor key
-        # generate sesion key based on conference key
-        c_key = ndb.Key(urlsafe=request.websafeConferenceKey)
-        s_id = Session.allocate_ids(size=1, parent=c_key)[0]
-        s_key = ndb.Key(Session, s_id, parent=c_key)
-
-        # create session
-        sesh = Session(
-            key             = s_key,
-            name            = data['name'],
-            highlights      = data['highlights'],
-            speaker         = data['speaker'],
-            duration        = data['duration'],
-            typeOfSession   = data['typeOfSession'],
-            date            = data['date'],
-            startTime       = data['startTime'],
-        )
+        if not requests:
+            return []
+
+        # define session ancestor keys
+        # generate session keys based on conference key
+        first, last = Session.allocate_ids(size=len(requests), parent=c_key)
+
+        sessions = []
+        speaker_names = {}
+        for s_id, request in zip(xrange(first, last + 1), requests):
+            # copy SessionForm/ProtoRPC Message into dict
+            data = {field.name: getattr(request, field.name) for field in SessionForm.all_fields()}
+            del data['seshWebSafeKey']
+
+            # Convert dates from strings to Date objects; 
+            if data['date']:
+                data['date'] = datetime.strptime(data['date'][:10], "%Y-%m-%d").date()
+            # Convert times from strings to time objects; 
+            if data['startTime']:
+                data['startTime'] = datetime.strptime(data['startTime'][:5], "%H:%M").time()
+
+            # create session
+            sesh = Session(
+                key             = ndb.Key(Session, s_id, parent=c_key),
+                name            = data['name'],
+                highlights      = data['highlights'],
+                speaker         = data['speaker'],
+                speakerKey      = speakers.speakerKey(data['speaker']),
+                duration        = data['duration'],
+                typeOfSession   = data['typeOfSession'],
+                date            = data['date'],
+                startTime       = data['startTime'],
+            )
+            sessions.append(sesh)
+            if sesh.speakerKey:
+                speaker_names.setdefault(sesh.speakerKey, sesh.speaker)
 
-        sesh.put()
+        ndb.put_multi(sessions)
+        responsecache.bump(responsecache.conferenceScope(c_key.urlsafe()),
+                           responsecache.SESSIONS_SCOPE)
+        schedule.scheduleRefresh(c_key.urlsafe())
 
-        taskqueue.add(
-            url='/tasks/get_featured_speaker',
-            params={'websafeConferenceKey': request.websafeConferenceKey, 
-                    'speaker': data['speaker']}, 
-            method='GET',
-        )
+        # the featured speaker task also adds the sessions to the Speaker
+        # aggregates, off this request and retried if it contends
+        speakers.scheduleFeatured(wsck, speaker_names.values())
 
-        return self._copySessionToForm(sesh)
+        return [self._copySessionToForm(sesh) for sesh in sessions]
 
     @endpoints.method(SESH_POST_REQUEST, SessionForm,
         path='createSession/{websafeConferenceKey}',
@@ -537,6 +943,17 @@ class ConferenceApi(remote.Service):
         """Create new Session"""
         return self._createSessionObject(request)
 
+    @endpoints.method(SESSIONS_POST_REQUEST, SessionForms,
+        path='createSessions/{websafeConferenceKey}',
+        http_method='POST',
+        name='createSessions')
+    def createSessions(self, request):
+        """Create several new Sessions in one conference"""
+        return SessionForms(
+            items=self._createSessionObjects(request.websafeConferenceKey,
+                                             list(request.items))
+        )
+
     @endpoints.method(SESH_GET_REQUEST, SessionForms,
         path='getConferenceSessions/{websafeConferenceKey}',
         http_method='GET',
@@ -550,36 +967,114 @@ class ConferenceApi(remote.Service):
         user_id =  getUserId(user)
 
         conf = ndb.Key(urlsafe=request.websafeConferenceKey)
-        print "1. This is the conf: ", conf
+        wsck = conf.urlsafe()
+        summary = self._isSummaryView(request.view)
+
+        def build():
+            # create ancestor query for all key matches for this user
+            sessions = Session.query(ancestor=conf)
+            if summary:
+                sessions = self._sessionSummaries(sessions)
+            self._debugLog('Conference sessions query: %s', sessions)
+
+            # return set of SessionForm objects per Session
+            fields = SESSION_SUMMARY_FIELDS if summary else None
+            return SessionForms(
+                items=[self._copySessionToForm(session, fields) for session in sessions]
+            )
 
-        # create ancestor query for all key matches for this user
-        sessions = Session.query(ancestor=conf)
-        print "2. This is the sessions object: ", sessions
+        return responsecache.cached('getConferenceSessions',
+            [responsecache.conferenceScope(wsck)], (wsck, summary),
+            SessionForms, build)
+
+    @staticmethod
+    def _refreshSchedule(websafeConferenceKey):
+        """Rebuild & store a conference's agenda snapshot, returning
+        the blob."""
+        conf = ndb.Key(urlsafe=websafeConferenceKey)
+        sessions = Session.query(ancestor=conf)\
+            .order(Session.date, Session.startTime)
+        data = schedule.encode(conf.urlsafe(), [
+            copyToForm(sesh, SessionForm, SESSION_TRANSFORMS,
+                       key_field='seshWebSafeKey')
+            for sesh in sessions])
+        schedule.store(conf.urlsafe(), data)
+        return data
+
+    @endpoints.method(CONF_GET_REQUEST, ScheduleForm,
+        path='getConferenceSchedule/{websafeConferenceKey}',
+        http_method='GET',
+        name='getConferenceSchedule')
+    def getConferenceSchedule(self, request):
+        """Given a conference, return its agenda snapshot: sessions by
+        date & start time, grouped by type. May lag new sessions by a
+        few seconds; use getConferenceSessions for an up-to-date list."""
+        # make sure user is authed
+        user = endpoints.get_current_user()
+        if not user:
+            raise endpoints.UnauthorizedException('Authorization required')
+        user_id =  getUserId(user)
+
+        conf = ndb.Key(urlsafe=request.websafeConferenceKey)
+        data = schedule.load(conf.urlsafe())
+        if data is None:
+            # first read of a conference with no snapshot yet
+            if not conf.get():
+                raise endpoints.NotFoundException(
+                    'No conference found with key: %s' % request.websafeConferenceKey)
+            data = self._refreshSchedule(conf.urlsafe())
+        return schedule.decode(data)
+
+    def _sessionSummaries(self, query):
+        """Return query's sessions in agenda order, projected down to the
+        summary fields."""
+        return query.order(Session.date, Session.startTime)\
+            .fetch(projection=SESSION_SUMMARY_FIELDS)
+
+    def _getConferenceSessionsByTypes(self, conf_key, types):
+        """Return a conference's sessions having any of the given types.
+
+        Each type is an ancestor + equality query (see index.yaml); with
+        several types the queries run in parallel and are merged, since a
+        session may carry more than one type.
+        """
+        futures = [Session.query(Session.typeOfSession == sesh_type,
+                                 ancestor=conf_key)
+                   .order(Session.date, Session.startTime)
+                   .fetch_async()
+                   for sesh_type in set(types)]
+        if len(futures) == 1:
+            return futures[0].get_result()
+
+        sessions = {}
+        for future in futures:
+            for sesh in future.get_result():
+                sessions[sesh.key] = sesh
+        return sorted(sessions.values(), key=_agendaOrder)
 
-        # return set of SessionForm objects per Session
-        return SessionForms(
-            items=[self._copySessionToForm(session) for session in sessions]
-        )
 
     @endpoints.method(SESH_QUERY_REQUEST, SessionForms,
             path='getConferenceSessionsByType/{websafeConferenceKey}',
             http_method='GET',
             name='getConferenceSessionsByType')
     def getConferenceSessionsByType(self, request):
-        """Given a conference, return all sessions of a specified type"""
+        """Given a conference, return all sessions of the specified type(s)"""
         # make sure user is authed
         user = endpoints.get_current_user()
         if not user:
             raise endpoints.UnauthorizedException('Authorization required')
         user_id =  getUserId(user)
 
-        conf = ndb.Key(urlsafe=request.websafeConferenceKey)
+        types = list(request.typesOfSession)
+        if request.typeOfSession:
+            types.append(request.typeOfSession)
+        if not types:
+            raise endpoints.BadRequestException(
+                "'typeOfSession' or 'typesOfSession' field required")
 
-        # create ancestor query for all key matches for this user
-        sessions = Session.query(ancestor=conf)
+        conf = ndb.Key(urlsafe=request.websafeConferenceKey)
+        sessions = self._getConferenceSessionsByTypes(conf, types)
 
-        sessions = Session.query(Session.typeOfSession == request.typeOfSession)
-           
         # return set of SessionForm objects per Session by type
         return SessionForms(
             items=[self._copySessionToForm(session) for session in sessions]
@@ -597,33 +1092,153 @@ class ConferenceApi(remote.Service):
             raise endpoints.UnauthorizedException('Authorization required')
         user_id =  getUserId(user)
 
-        sessions = Session.query(Session.speaker == request.speaker)
+        backfilled = speakers.backfilled()
 
-        return SessionForms(
-            items=[self._copySessionToForm(session) for session in sessions]
-        ) 
+        def build():
+            if not backfilled:
+                # older sessions not backfilled yet, see _migrateSessions
+                sessions = Session.query(Session.speaker == request.speaker)
+            else:
+                sesh_keys = speakers.sessionKeys(request.speaker)
+                sessions = sorted(filter(None, ndb.get_multi(sesh_keys)),
+                                  key=_agendaOrder)
+            return SessionForms(
+                items=[self._copySessionToForm(session) for session in sessions]
+            )
+
+        # once backfilled, name variants of one speaker share a cache entry;
+        # before, the query matches the name exactly
+        speaker = request.speaker
+        if backfilled:
+            speaker = speakers.normalize(request.speaker or '')
+        return responsecache.cached('getSessionsBySpeaker',
+            [responsecache.SESSIONS_SCOPE], (backfilled, speaker),
+            SessionForms, build)
 
 #  ------------
 #  |  TASK 3  |
 #  ------------
-    @endpoints.method(SessionForms, SessionForms,
+    @endpoints.method(SESSIONS_GET_REQUEST, SessionForms,
             path='getSessions',
             http_method='GET',
             name='getSessions')
     def getSessions(self, request):
-        """Return all sessions across all conferences"""
+        """Return a page of sessions across all conferences, optionally
+        within a date range and/or of one type"""
         # make sure user is authed
         user = endpoints.get_current_user()
         if not user:
             raise endpoints.UnauthorizedException('Authorization required')
         user_id =  getUserId(user)
 
-        sessions = Session.query()
+        page_size, cursor = self._getPageArgs(request)
+        query = self._sessionsQuery(self._parseDate(request.startDate),
+                                    self._parseDate(request.endDate),
+                                    request.typeOfSession)
+        fields = None
+        projection = None
+        if self._isSummaryView(request.view):
+            fields = projection = SESSION_SUMMARY_FIELDS
+
+        sessions, next_cursor, more = query.fetch_page(
+            page_size, start_cursor=cursor, projection=projection)
 
         return SessionForms(
-            items=[self._copySessionToForm(session) for session in sessions]
+            items=[self._copySessionToForm(session, fields) for session in sessions],
+            nextPageToken=next_cursor.urlsafe() if more and next_cursor else None
         )
 
+    def _parseDate(self, value):
+        """Convert an optional 'YYYY-MM-DD' request string to a Date."""
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value[:10], "%Y-%m-%d").date()
+        except ValueError:
+            raise endpoints.BadRequestException(
+                "Dates must be given as YYYY-MM-DD.")
+
+    @staticmethod
+    def _sessionsQuery(startDate=None, endDate=None, typeOfSession=None):
+        """Return a query for sessions across all conferences in agenda
+        order, optionally within a date range and/or of one type."""
+        q = Session.query()
+        if typeOfSession:
+            q = q.filter(Session.typeOfSession == typeOfSession)
+        if startDate:
+            q = q.filter(Session.date >= startDate)
+        if endDate:
+            q = q.filter(Session.date <= endDate)
+        return q.order(Session.date, Session.startTime)
+
+    @staticmethod
+    def _streamSessions(startDate=None, endDate=None, typeOfSession=None,
+                        batch_size=STREAM_BATCH_SIZE):
+        """Yield every matching session in agenda order, fetching
+        batch_size at a time; for internal consumers (tasks) that need
+        the whole set rather than a page."""
+        query = ConferenceApi._sessionsQuery(startDate, endDate, typeOfSession)
+        for sesh in query.iter(batch_size=batch_size, prefetch_size=batch_size):
+            yield sesh
+
+    @endpoints.method(SESSION_QUERY_REQUEST, SessionForms,
+            path='querySessions',
+            http_method='GET',
+            name='querySessions')
+    def querySessions(self, request):
+        """Return a page of sessions matching date & start time ranges,
+        speaker and type, across all conferences or within one"""
+        # make sure user is authed
+        user = endpoints.get_current_user()
+        if not user:
+            raise endpoints.UnauthorizedException('Authorization required')
+        user_id =  getUserId(user)
+
+        page_size, cursor, pushed = self._getPlannedPageArgs(request)
+
+        filters = []
+        for field in SESSION_EQUALITY_FIELDS:
+            value = getattr(request, field)
+            if value:
+                filters.append({"field": field, "operator": '=', "value": value})
+        for field, op, value in (
+                ('date', '>=', self._parseDate(request.startDate)),
+                ('date', '<=', self._parseDate(request.endDate)),
+                ('startTime', '>=', self._parseTime(request.startTimeFrom)),
+                ('startTime', '<=', self._parseTime(request.startTimeTo))):
+            if value:
+                filters.append({"field": field, "operator": op, "value": value})
+
+        # one inequality goes to the datastore, the other is checked in memory
+        query_plan = self._plan(filters, Session, pushed, SESSION_ORDER)
+        q = Session.query()
+        if request.websafeConferenceKey:
+            q = Session.query(ancestor=ndb.Key(urlsafe=request.websafeConferenceKey))
+        # filter through the model properties, which convert dates &
+        # times to the datetimes the datastore stores them as
+        for filtr in query_plan.datastore_filters:
+            prop = Session._properties[filtr["field"]]
+            q = q.filter(prop._comparison(filtr["operator"], filtr["value"]))
+        for field in query_plan.order:
+            q = q.order(Session._properties[field])
+
+        sessions, next_token = self._fetchPage(q, query_plan, page_size, cursor,
+                                               keys_only=False)
+        return SessionForms(
+            items=[self._copySessionToForm(session) for session in sessions],
+            nextPageToken=self._plannedPageToken(query_plan, next_token)
+        )
+
+    def _parseTime(self, value):
+        """Convert an optional 'HH:MM' request string to a Time."""
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value[:5], "%H:%M").time()
+        except ValueError:
+            raise endpoints.BadRequestException(
+                "Times must be given as HH:MM.")
+
     @endpoints.method(DATE_QUERY_REQUEST, SessionForms,
             path='getSessionsByDate',
             http_method='GET',
@@ -643,11 +1258,14 @@ class ConferenceApi(remote.Service):
         if data['date']:
             data['date'] = datetime.strptime(data['date'][:10], "%Y-%m-%d").date()
 
-        sessions = Session.query(Session.date == data['date'])
+        def build():
+            sessions = Session.query(Session.date == data['date'])
+            return SessionForms(
+                items=[self._copySessionToForm(session) for session in sessions]
+            )
 
-        return SessionForms(
-            items=[self._copySessionToForm(session) for session in sessions]
-        )
+        return responsecache.cached('getSessionsByDate',
+            [responsecache.SESSIONS_SCOPE], str(data['date']), SessionForms, build)
 
     @endpoints.method(STARTTIME_QUERY_REQUEST, SessionForms,
             path='getSessionsByTime',
@@ -668,56 +1286,53 @@ class ConferenceApi(remote.Service):
         if data['startTime']:
             data['startTime'] = datetime.strptime(data['startTime'][:5], "%H:%M").time()
 
-        sessions = Session.query(Session.startTime == data['startTime'])
+        def build():
+            sessions = Session.query(Session.startTime == data['startTime'])
+            return SessionForms(
+                items=[self._copySessionToForm(session) for session in sessions]
+            )
 
-        return SessionForms(
-            items=[self._copySessionToForm(session) for session in sessions]
-        )
+        return responsecache.cached('getSessionsByTime',
+            [responsecache.SESSIONS_SCOPE], str(data['startTime']), SessionForms, build)
 
 # - - - WishList - - - - - - - - - - - - - - - - - - - -
 
 #  ------------
 #  |  TASK 2  |
 #  ------------
-    @ndb.transactional(xg=True)
+    @ndb.transactional()
+    def _updateWishlist(self, entry_key, sesh_key, add):
+        """Add or remove one WishlistEntry under the user's Profile"""
+        entry = entry_key.get()
+
+        # adding
+        if add:
+            if entry:
+                raise ConflictException("Session already added to wishlist")
+            WishlistEntry(key=entry_key, session=sesh_key).put()
+            return True
+
+        # removing
+        if not entry:
+            return False
+        entry_key.delete()
+        return True
+
     def _sessionWishlist(self, request, add=True):
         """Add or remove session to wishlist"""
-        retval = None
         # Get session profile
         prof = self._getProfileFromUser()
-        print "1. This is the users profile: ", prof
 
         # Check if sesh exists given websafeSeshKey
         wssk = request.SessionKey
-        print "2. This is the request.sessionkey: ", wssk
         sesh = ndb.Key(urlsafe=wssk).get()
-        print "3. This is the sesh: ", sesh
+        self._debugLog('Wishlist %s for %s: %s', wssk, prof.key.id(), sesh)
         if not sesh:
             raise endpoints.NotFoundException(
                 'No session found with key: %s' % wssk)
 
-        # adding
-        if add:
-            if wssk in prof.sessionsToWishlist:
-                raise ConflictException("Session already added to wishlist")
-
-            prof.sessionsToWishlist.append(wssk)
-            retval = True
-
-        # removing
-        else:
-            # check if session already in wishlist
-            if wssk in prof.sessionsToWishlist:
-                # remove from wishlist
-                prof.sessionsToWishlist.remove(wssk)
-                retval = True
-            else:
-                retval = False
-
-        # write things back to datastore & return
-        prof.put()
-
-        return BooleanMessage(data=retval)
+        entry_key = ndb.Key(WishlistEntry, _refId(sesh.key), parent=prof.key)
+        return BooleanMessage(data=self._updateWishlist(entry_key, sesh.key, add))
 
     @endpoints.method(WISHLIST_POST_REQUEST, BooleanMessage,
             path='session/addToWishlist/{SessionKey}',
@@ -742,18 +1357,84 @@ class ConferenceApi(remote.Service):
     def getSessionsInWishlist(self, request):
         """Get list of sessions in wishlist"""
         prof = self._getProfileFromUser() # get user profile
-        sesh_keys = [ndb.Key(urlsafe=wssk) for wssk in prof.sessionsToWishlist]
-        sessions = ndb.get_multi(sesh_keys)
+        entries = WishlistEntry.query(ancestor=prof.key).fetch()
+        sessions = ndb.get_multi([entry.session for entry in entries])
 
         return SessionForms(
-            items=[self._copySessionToForm(session) for session in sessions]
+            items=[self._copySessionToForm(session) for session in sessions if session]
+        )
+
+    @endpoints.method(message_types.VoidMessage, AgendaForm,
+            path='session/wishlist/agenda',
+            http_method='GET',
+            name='getWishlistAgenda')
+    def getWishlistAgenda(self, request):
+        """Get wishlist sessions in time order, the groups of them that
+        overlap and a suggested largest set that doesn't"""
+        prof = self._getProfileFromUser() # get user profile
+        entries = WishlistEntry.query(ancestor=prof.key).fetch()
+        sessions = filter(None, ndb.get_multi([entry.session for entry in entries]))
+        sessions.sort(key=lambda sesh: _agendaOrder(sesh) + (sesh.name,))
+
+        # sessions with no date or start time can't clash; they're
+        # listed but left out of conflicts & the suggestion
+        forms = [self._copySessionToForm(sesh) for sesh in sessions]
+        intervals = filter(None, [
+            agenda.interval(sesh.date, sesh.startTime, sesh.duration, sf.seshWebSafeKey)
+            for sesh, sf in zip(sessions, forms)])
+
+        return AgendaForm(
+            items=forms,
+            conflicts=[ConflictForm(seshWebSafeKeys=[iv[2] for iv in group])
+                       for group in agenda.conflicts(intervals)],
+            suggested=[iv[2] for iv in agenda.best(intervals)],
         )
 
 # - - - Registration - - - - - - - - - - - - - - - - - - - -
 
     @ndb.transactional(xg=True)
+    def _takeSeat(self, reg_key, shard_key, conf_key):
+        """Register Profile & take a seat from one shard; None if it's empty."""
+        reg, shard = ndb.get_multi([reg_key, shard_key])
+
+        # check if user already registered otherwise add
+        if reg:
+            raise ConflictException(
+                "You have already registered for this conference")
+
+        # check if seats avail in this shard
+        if shard.seats <= 0:
+            return None
+
+        # register user, take away one seat
+        shard.seats -= 1
+        ndb.put_multi([Registration(key=reg_key, conference=conf_key), shard])
+        return True
+
+
+    @ndb.transactional(xg=True)
+    def _returnSeat(self, reg_key, shard_key):
+        """Unregister Profile & give its seat back to a shard."""
+        reg, shard = ndb.get_multi([reg_key, shard_key])
+
+        # check if user already registered
+        if not reg:
+            return False
+
+        # unregister user, add back one seat
+        shard.seats += 1
+        reg_key.delete()
+        shard.put()
+        return True
+
+
     def _conferenceRegistration(self, request, reg=True):
-        """Register or unregister user for selected conference."""
+        """Register or unregister user for selected conference.
+
+        Seats come from the conference's sharded counter (see seats.py),
+        so each transaction only touches the user's Registration and one
+        shard.
+        """
         retval = None
 
         prof = self._getProfileFromUser() # get user Profile
@@ -765,39 +1446,30 @@ class ConferenceApi(remote.Service):
         if not conf:
             raise endpoints.NotFoundException(
                 'No conference found with key: %s' % wsck)
+        reg_key = ndb.Key(Registration, _refId(conf.key), parent=prof.key)
 
         # register
         if reg:
-            # check if user already registered otherwise add
-            if wsck in prof.conferenceKeysToAttend:
+            if reg_key.get():
                 raise ConflictException(
                     "You have already registered for this conference")
 
-            # check if seats avail
-            if conf.seatsAvailable <= 0:
+            # try shards that had seats until one still does
+            for shard_key in seats.shardsWithSeats(conf.key):
+                retval = self._takeSeat(reg_key, shard_key, conf.key)
+                if retval:
+                    break
+            else:
                 raise ConflictException(
                     "There are no seats available.")
 
-            # register user, take away one seat
-            prof.conferenceKeysToAttend.append(wsck)
-            conf.seatsAvailable -= 1
-            retval = True
-
         # unregister
         else:
-            # check if user already registered
-            if wsck in prof.conferenceKeysToAttend:
-
-                # unregister user, add back one seat
-                prof.conferenceKeysToAttend.remove(wsck)
-                conf.seatsAvailable += 1
-                retval = True
-            else:
-                retval = False
+            retval = self._returnSeat(reg_key, seats.anyShard(conf.key))
 
-        # write things back to the datastore & return
-        prof.put()
-        conf.put()
+        # seatsAvailable on the Conference catches up shortly
+        if retval:
+            seats.scheduleRefresh(conf.key)
         return BooleanMessage(data=retval)
 
 
@@ -807,21 +1479,12 @@ class ConferenceApi(remote.Service):
     def getConferencesToAttend(self, request):
         """Get list of conferences that user has registered for."""
         prof = self._getProfileFromUser() # get user Profile
-        conf_keys = [ndb.Key(urlsafe=wsck) for wsck in prof.conferenceKeysToAttend]
-        conferences = ndb.get_multi(conf_keys)
-
-        # get organizers
-        organisers = [ndb.Key(Profile, conf.organizerUserId) for conf in conferences]
-        profiles = ndb.get_multi(organisers)
-
-        # put display names in a dict for easier fetching
-        names = {}
-        for profile in profiles:
-            names[profile.key.id()] = profile.displayName
+        regs = Registration.query(ancestor=prof.key).fetch()
+        conf_keys = [reg.conference for reg in regs]
 
         # return set of ConferenceForm objects per Conference
-        return ConferenceForms(items=[self._copyConferenceToForm(conf, names[conf.organizerUserId])\
-         for conf in conferences]
+        return ConferenceForms(items=[self._copyConferenceToForm(conf, name)\
+         for conf, name in self._getConferencesWithNames(conf_keys)]
         )
 
 
@@ -841,6 +1504,232 @@ class ConferenceApi(remote.Service):
         return self._conferenceRegistration(request, reg=False)
 
 
+# - - - Attendees - - - - - - - - - - - - - - - - - - - - - -
+
+    def _getOwnConference(self, websafeConferenceKey):
+        """Return Conference if the current user organizes it."""
+        user = endpoints.get_current_user()
+        if not user:
+            raise endpoints.UnauthorizedException('Authorization required')
+        user_id = getUserId(user)
+
+        conf = ndb.Key(urlsafe=websafeConferenceKey).get()
+        if not conf:
+            raise endpoints.NotFoundException(
+                'No conference found with key: %s' % websafeConferenceKey)
+        if user_id != conf.organizerUserId:
+            raise endpoints.ForbiddenException(
+                'Only the owner can see who is attending.')
+        return conf
+
+
+    @staticmethod
+    def _attendeesQuery(conf_key):
+        """Return a query for a conference's Registrations."""
+        return Registration.query(Registration.conference == conf_key)
+
+
+    @endpoints.method(ATTENDEES_GET_REQUEST, AttendeeForms,
+            path='conference/{websafeConferenceKey}/attendees',
+            http_method='GET', name='getConferenceAttendees')
+    def getConferenceAttendees(self, request):
+        """Return one page of a conference's attendees (organizer only)."""
+        conf = self._getOwnConference(request.websafeConferenceKey)
+        page_size, cursor = self._getPageArgs(request)
+
+        # Registrations are Profile children, so keys give us the Profiles
+        reg_keys, next_cursor, more = self._attendeesQuery(conf.key).fetch_page(
+            page_size, start_cursor=cursor, keys_only=True)
+        profiles = ndb.get_multi([reg_key.parent() for reg_key in reg_keys])
+
+        return AttendeeForms(
+            items=[AttendeeForm(displayName=prof.displayName,
+                                mainEmail=prof.mainEmail)
+                   for prof in profiles if prof],
+            nextPageToken=next_cursor.urlsafe() if more and next_cursor else None
+        )
+
+
+    @endpoints.method(CONF_GET_REQUEST, StringMessage,
+            path='conference/{websafeConferenceKey}/attendees/export',
+            http_method='POST', name='exportConferenceAttendees')
+    def exportConferenceAttendees(self, request):
+        """Start a CSV export of a conference's attendees (organizer only);
+        returns the Cloud Storage path the file will be written to.
+        """
+        conf = self._getOwnConference(request.websafeConferenceKey)
+        wsck = conf.key.urlsafe()
+        taskqueue.add(params={'websafeConferenceKey': wsck},
+            url='/tasks/export_attendees'
+        )
+        return StringMessage(data=self._attendeesExportPath(wsck))
+
+
+    @staticmethod
+    def _attendeesExportPath(websafeConferenceKey):
+        """Return the Cloud Storage path of a conference's attendee CSV."""
+        return '/%s/attendees/%s.csv' % (
+            app_identity.get_default_gcs_bucket_name(), websafeConferenceKey)
+
+
+    @staticmethod
+    def _exportAttendees(websafeConferenceKey, batch_size=EXPORT_BATCH_SIZE):
+        """Stream a conference's attendees to a CSV file in Cloud Storage,
+        one keys-only batch at a time; used by the export_attendees task.
+        """
+        import cloudstorage
+
+        conf_key = ndb.Key(urlsafe=websafeConferenceKey)
+        q = ConferenceApi._attendeesQuery(conf_key)
+        path = ConferenceApi._attendeesExportPath(websafeConferenceKey)
+
+        count = 0
+        with cloudstorage.open(path, 'w', content_type='text/csv') as out:
+            writer = csv.writer(out)
+            writer.writerow(['displayName', 'mainEmail'])
+            cursor = None
+            more = True
+            while more:
+                reg_keys, cursor, more = q.fetch_page(
+                    batch_size, start_cursor=cursor, keys_only=True)
+                profiles = ndb.get_multi(
+                    [reg_key.parent() for reg_key in reg_keys])
+                for prof in profiles:
+                    if prof:
+                        writer.writerow([
+                            (prof.displayName or '').encode('utf-8'),
+                            (prof.mainEmail or '').encode('utf-8')])
+                        count += 1
+                # don't let ndb's context cache grow with the roster
+                ndb.get_context().clear_cache()
+        return count
+
+
+# - - - Registration migration - - - - - - - - - - - - - - -
+    @staticmethod
+    @ndb.transactional()
+    def _migrateProfile(p_key):
+        """Move a Profile's conferenceKeysToAttend & sessionsToWishlist
+        lists into Registration & WishlistEntry entities.
+        """
+        prof = p_key.get()
+        if not prof:
+            return None
+        entities = []
+        for wsck in prof.conferenceKeysToAttend:
+            conf_key = ndb.Key(urlsafe=wsck)
+            entities.append(Registration(
+                key=ndb.Key(Registration, _refId(conf_key), parent=p_key),
+                conference=conf_key))
+        for wssk in prof.sessionsToWishlist:
+            sesh_key = ndb.Key(urlsafe=wssk)
+            entities.append(WishlistEntry(
+                key=ndb.Key(WishlistEntry, _refId(sesh_key), parent=p_key),
+                session=sesh_key))
+        if entities:
+            prof.conferenceKeysToAttend = []
+            prof.sessionsToWishlist = []
+            ndb.put_multi(entities + [prof])
+        return prof
+
+
+    @staticmethod
+    def _migrateProfiles(websafeCursor=None, batch_size=50):
+        """Migrate one batch of Profiles, returning the cursor for the
+        next batch or None when done; used by the migration task.
+        """
+        cursor = Cursor(urlsafe=websafeCursor) if websafeCursor else None
+        p_keys, cursor, more = Profile.query().fetch_page(
+            batch_size, start_cursor=cursor, keys_only=True)
+        for p_key in p_keys:
+            ConferenceApi._migrateProfile(p_key)
+        return cursor.urlsafe() if more and cursor else None
+
+
+    @staticmethod
+    def _migrateSessions(websafeCursor=None, batch_size=100):
+        """Set speakerKey on one batch of Sessions & add them to their
+        Speaker's aggregates, returning the cursor for the next batch or
+        None when done; used by the speaker migration task.
+        """
+        cursor = Cursor(urlsafe=websafeCursor) if websafeCursor else None
+        sessions, cursor, more = Session.query().fetch_page(
+            batch_size, start_cursor=cursor)
+
+        # recording is idempotent, so sessions already carrying a
+        # speakerKey are recorded again in case that write was lost
+        by_speaker = {}
+        stale = []
+        for sesh in sessions:
+            s_key = speakers.speakerKey(sesh.speaker)
+            if not s_key:
+                continue
+            if sesh.speakerKey != s_key:
+                sesh.speakerKey = s_key
+                stale.append(sesh)
+            by_speaker.setdefault((s_key, sesh.key.parent()), []).append(sesh)
+
+        for (s_key, conf_key), speaker_sessions in by_speaker.iteritems():
+            speakers.record(speaker_sessions[0].speaker, conf_key, speaker_sessions)
+        ndb.put_multi(stale)
+        if by_speaker:
+            responsecache.bump(responsecache.SESSIONS_SCOPE)
+        if more and cursor:
+            return cursor.urlsafe()
+
+        # from here on speaker reads can trust the aggregates
+        speakers.markBackfilled()
+        responsecache.bump(responsecache.SESSIONS_SCOPE)
+        return None
+
+
+# - - - Organizer names - - - - - - - - - - - - - - - - - - -
+    @staticmethod
+    @ndb.transactional()
+    def _renameOrganizer(p_key, conf_keys):
+        """Set organizerDisplayName on the given Conferences (children of
+        Profile p_key, so one entity group) to the Profile's current
+        displayName, returning the Conferences changed.
+
+        Everything is re-read in the transaction, so a concurrent
+        updateConference or name change makes it retry rather than
+        being overwritten.
+        """
+        entities = ndb.get_multi([p_key] + conf_keys)
+        prof, confs = entities[0], entities[1:]
+        if not prof:
+            return []
+        stale = [conf for conf in confs
+                 if conf and conf.organizerDisplayName != prof.displayName]
+        for conf in stale:
+            conf.organizerDisplayName = prof.displayName
+        ndb.put_multi(stale)
+        return stale
+
+
+    @staticmethod
+    def _updateOrganizerDisplayName(user_id, batch_size=100):
+        """Copy a Profile's current displayName onto all its Conferences;
+        used by the update_organizer_name task.
+        """
+        p_key = ndb.Key(Profile, user_id)
+        q = Conference.query(ancestor=p_key)
+        cursor = None
+        updated = 0
+        more = True
+        while more:
+            conf_keys, cursor, more = q.fetch_page(
+                batch_size, start_cursor=cursor, keys_only=True)
+            if not conf_keys:
+                break
+            stale = ConferenceApi._renameOrganizer(p_key, conf_keys)
+            if stale:
+                responsecache.bump(*[responsecache.conferenceScope(conf.key.urlsafe())
+                                     for conf in stale])
+            updated += len(stale)
+        return updated
+
+
 # - - - Announcements - - - - - - - - - - - - - - - - - - - -
     @staticmethod
     def _cacheAnnouncement():
@@ -886,40 +1775,60 @@ class ConferenceApi(remote.Service):
 #  |  TASK 4  |
 #  ------------
     @staticmethod
-    def _cacheFeaturedSpeaker(websafeConferenceKey, speaker):
-        """Assign featured speaker to memcache"""
-        #logging.info('1: This is the websafeConferenceKey: ' + websafeConferenceKey)
-        #logging.info('2: This is the speaker: ' + speaker)
-        
-        conf = ndb.Key(urlsafe=websafeConferenceKey)
+    def _featuredSpeakerKey(websafeConferenceKey):
+        """Return the memcache key holding a conference's featured speaker."""
+        return '%s_%s' % (MEMCACHE_FEATURED_KEY, websafeConferenceKey)
 
-        print "3. This is the conf: ", conf
 
-        sessions = Session.query(ancestor=conf)
+    @staticmethod
+    def _cacheFeaturedSpeaker(websafeConferenceKey, speaker):
+        """Add speaker's sessions in the conference to their Speaker
+        aggregates, then assign conference's featured speaker to memcache
+        if speaker has more than one session in that conference.
+        """
+        logging.debug('Featured speaker check: %s in %s',
+                      speaker, websafeConferenceKey)
+
+        conf = ndb.Key(urlsafe=websafeConferenceKey)
+        if not speakers.speakerKey(speaker):
+            return ""
+        per_conf = speakers.recordConference(speaker, conf)
 
-        sessions = Session.query(Session.speaker == speaker).fetch()
-        
-        count = len(sessions)
+        if speakers.backfilled():
+            # the speaker's sessions in this conference, by key
+            names = per_conf.sessionNames
+        else:
+            # older sessions may not be in the aggregates yet
+            names = [session.name for session in
+                     Session.query(Session.speaker == speaker, ancestor=conf)]
 
-        if count > 1:
+        if len(names) > 1:
             featured = 'Todays featured speaker is %s at session %s' %\
-             (speaker, ', '.join(session.name for session in sessions))
-            memcache.set(MEMCACHE_FEATURED_KEY, featured)
+             (speaker, ', '.join(names))
+            memcache.set_multi({
+                ConferenceApi._featuredSpeakerKey(websafeConferenceKey): featured,
+                # most recent featured speaker across all conferences
+                MEMCACHE_FEATURED_KEY: featured,
+            })
         else:
-            # If there are is no featured speaker,
-            # delete the memcache featured entry
+            # leave any other speaker already featured for this conference
             featured = ""
-            memcache.delete(MEMCACHE_FEATURED_KEY)
 
         return featured
 
-    @endpoints.method(message_types.VoidMessage, StringMessage,
+    @endpoints.method(FEATURED_GET_REQUEST, StringMessage,
             path='session/featured/get',
             http_method='GET', 
             name='getFeaturedSpeaker')
     def getFeaturedSpeaker(self, request):
-        """Return featured speaker from memcache."""
-        featured = memcache.get(MEMCACHE_FEATURED_KEY)
+        """Return featured speaker from memcache, for the given conference
+        if websafeConferenceKey is set, otherwise the most recent one.
+        """
+        if request.websafeConferenceKey:
+            key = self._featuredSpeakerKey(request.websafeConferenceKey)
+        else:
+            key = MEMCACHE_FEATURED_KEY
+        featured = memcache.get(key)
         if not featured:
             featured = ""
         return StringMessage(data=featured)
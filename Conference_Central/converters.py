@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+
+"""converters.py
+
+Copy ndb entities into ProtoRPC form messages using a field-mapping plan
+that is worked out once per (Model, Message) pair instead of reflecting
+over all_fields() for every entity.
+
+"""
+
+_plans = {}
+
+
+def _buildPlan(model_cls, message_cls, transforms, fields):
+    """Return (plan, required) for copying model_cls into message_cls.
+
+    plan is a tuple of (field name, transform or None) for every message
+    field backed by a model property (limited to fields, if given);
+    required says whether the message
+    has any required fields worth a check_initialized() call.
+    """
+    plan = []
+    required = False
+    for field in message_cls.all_fields():
+        required = required or field.required
+        if fields is not None and field.name not in fields:
+            continue
+        if field.name in model_cls._properties:
+            plan.append((field.name, transforms.get(field.name)))
+    return tuple(plan), required
+
+
+def copyToForm(entity, message_cls, transforms=None, key_field=None,
+               fields=None):
+    """Copy entity into a new message_cls instance.
+
+    transforms maps field names to callables applied to the entity value
+    (e.g. str for dates); key_field names the message field that receives
+    the entity's urlsafe key; fields, a tuple of field names, limits the
+    copy to those fields (e.g. for projected entities). The plan is
+    cached on the first call for a given (Model, Message, fields), so
+    callers should pass the same transforms/key_field each time.
+    """
+    cache_key = (type(entity), message_cls, fields)
+    try:
+        plan, required = _plans[cache_key]
+    except KeyError:
+        plan, required = _buildPlan(type(entity), message_cls,
+                                    transforms or {}, fields)
+        _plans[cache_key] = (plan, required)
+
+    form = message_cls()
+    for name, transform in plan:
+        value = getattr(entity, name)
+        if transform is not None:
+            value = transform(value)
+        setattr(form, name, value)
+    if key_field:
+        setattr(form, key_field, entity.key.urlsafe())
+    if required:
+        form.check_initialized()
+    return form
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+"""displaynames.py
+
+Read-through cache of Profile displayNames keyed by user id: a small
+process-local LRU in front of memcache, in front of the datastore.
+
+Local entries expire after LOCAL_TTL seconds so a rename made on another
+instance shows up without a cross-instance invalidation.
+
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from google.appengine.api import memcache
+from google.appengine.ext import ndb
+
+from models import Profile
+
+MEMCACHE_PREFIX = "DISPLAY_NAME_"
+MEMCACHE_TTL = 60 * 60
+LOCAL_SIZE = 1000
+LOCAL_TTL = 60
+
+_local = OrderedDict()
+_lock = threading.Lock()
+
+
+def _localGet(user_id, now):
+    """Return (hit, name) from the local LRU, refreshing its position."""
+    with _lock:
+        entry = _local.pop(user_id, None)
+        if entry is None or entry[0] < now:
+            return False, None
+        _local[user_id] = entry
+        return True, entry[1]
+
+
+def _localSet(user_id, name, now):
+    """Store name in the local LRU, evicting the oldest entries."""
+    with _lock:
+        _local.pop(user_id, None)
+        _local[user_id] = (now + LOCAL_TTL, name)
+        while len(_local) > LOCAL_SIZE:
+            _local.popitem(last=False)
+
+
+def getDisplayNames(user_ids):
+    """Return a {user_id: displayName} dict for the given user ids.
+
+    User ids with no Profile are left out of the result.
+    """
+    now = time.time()
+    names = {}
+    missing = []
+    for user_id in set(user_ids):
+        hit, name = _localGet(user_id, now)
+        if hit:
+            names[user_id] = name
+        else:
+            missing.append(user_id)
+    if not missing:
+        return names
+
+    cached = memcache.get_multi(missing, key_prefix=MEMCACHE_PREFIX)
+    for user_id, name in cached.iteritems():
+        names[user_id] = name
+        _localSet(user_id, name, now)
+    missing = [user_id for user_id in missing if user_id not in cached]
+    if not missing:
+        return names
+
+    fetched = {}
+    profiles = ndb.get_multi([ndb.Key(Profile, user_id) for user_id in missing])
+    for profile in profiles:
+        if profile:
+            fetched[profile.key.id()] = profile.displayName or ''
+    if fetched:
+        memcache.set_multi(fetched, key_prefix=MEMCACHE_PREFIX,
+                           time=MEMCACHE_TTL)
+        for user_id, name in fetched.iteritems():
+            _localSet(user_id, name, now)
+        names.update(fetched)
+    return names
+
+
+def getDisplayName(user_id):
+    """Return the displayName for a single user id, or None."""
+    return getDisplayNames([user_id]).get(user_id)
+
+
+def setDisplayName(user_id, name):
+    """Refresh the cached displayName after the Profile has been saved."""
+    name = name or ''
+    memcache.set(MEMCACHE_PREFIX + user_id, name, time=MEMCACHE_TTL)
+    _localSet(user_id, name, time.time())
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+
+"""fieldstats.py
+
+Sampled property values for queryplanner's cost model.
+
+For each property queries may filter on, a projection query reads
+every value. It reads the property's index, so values come in value
+order and the first rows are no sample at all; instead SAMPLE_SIZE of
+them are drawn uniformly as they stream past, and SAMPLE_POINTS evenly
+spaced values of the sorted draw are kept. The planner estimates how
+many entities a filter lets through from how much of that sample passes
+it, so "month > 6" and "maxAttendees < 100" no longer look alike.
+
+Samples are rebuilt by a daily cron job, kept in one FieldStats entity
+per kind and cached in memcache. Until the first rebuild there are none
+and the planner falls back to per-operator guesses.
+
+"""
+
+import random
+
+from google.appengine.api import memcache
+from google.appengine.ext import ndb
+
+from models import Conference, FieldStats, Session
+
+MEMCACHE_PREFIX = "FIELD_STATS_"
+MEMCACHE_TTL = 60 * 60
+SAMPLE_SIZE = 1000
+SAMPLE_POINTS = 101
+
+# the properties queryConferences & querySessions filter on
+SAMPLED_FIELDS = {
+    Conference: ('city', 'topics', 'month', 'maxAttendees'),
+    Session: ('date', 'startTime'),
+}
+
+
+def _points(values):
+    """Return SAMPLE_POINTS evenly spaced values of sorted values."""
+    if len(values) <= SAMPLE_POINTS:
+        return values
+    last = len(values) - 1
+    return [values[i * last // (SAMPLE_POINTS - 1)]
+            for i in range(SAMPLE_POINTS)]
+
+
+def collect(model_cls, fields):
+    """Return {field: sorted sample of its values} for model_cls."""
+    samples = {}
+    for field in fields:
+        # served by the built-in single property index
+        rows = model_cls.query().iter(
+            projection=[model_cls._properties[field]], batch_size=SAMPLE_SIZE)
+        values = []
+        seen = 0
+        for row in rows:
+            value = getattr(row, field)
+            # a projected repeated property holds the one projected value
+            if isinstance(value, list):
+                value = value[0] if value else None
+            if value is None:
+                continue
+            # reservoir sampling: every value is kept with equal chance
+            seen += 1
+            if len(values) < SAMPLE_SIZE:
+                values.append(value)
+            else:
+                i = random.randrange(seen)
+                if i < SAMPLE_SIZE:
+                    values[i] = value
+        if values:
+            samples[field] = _points(sorted(values))
+    return samples
+
+
+def refresh():
+    """Rebuild and store every kind's samples; used by the cron job."""
+    for model_cls, fields in SAMPLED_FIELDS.iteritems():
+        kind = model_cls._get_kind()
+        samples = collect(model_cls, fields)
+        FieldStats(id=kind, samples=samples).put()
+        memcache.set(MEMCACHE_PREFIX + kind, samples, time=MEMCACHE_TTL)
+
+
+def get(model_cls):
+    """Return {field: sorted sample} for model_cls, {} if none yet."""
+    kind = model_cls._get_kind()
+    samples = memcache.get(MEMCACHE_PREFIX + kind)
+    if samples is None:
+        stats = ndb.Key(FieldStats, kind).get()
+        samples = stats.samples if stats else {}
+        # remember "none yet" too, so the planner doesn't keep looking
+        memcache.set(MEMCACHE_PREFIX + kind, samples, time=MEMCACHE_TTL)
+    return samples
@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+
+"""indexgen.py
+
+Print the Conference composite indexes queryConferences can need, in
+index.yaml format, for every filter combination FIELDS & OPERATORS allow,
+then the Session indexes querySessions can need, with and without a
+conference ancestor.
+
+usage: python indexgen.py >> index.yaml   (with the App Engine SDK on
+PYTHONPATH, as conference.py imports it)
+
+"""
+
+from conference import FIELDS
+from conference import SESSION_EQUALITY_FIELDS
+from conference import SESSION_ORDER
+import queryplanner
+
+
+def main():
+    for index in queryplanner.requiredIndexes(FIELDS.values()):
+        print queryplanner.indexYaml(index)
+    for index in queryplanner.requiredIndexes(
+            SESSION_EQUALITY_FIELDS, SESSION_ORDER, SESSION_ORDER):
+        for ancestor in (True, False):
+            print queryplanner.indexYaml(index, 'Session', ancestor)
+
+
+if __name__ == '__main__':
+    main()
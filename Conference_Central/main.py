@@ -12,12 +12,20 @@ created by wesc on 2014 may 24
 
 __author__ = 'wesc+api@google.com (Wesley Chun)'
 
+import json
+
 import webapp2
 from google.appengine.api import app_identity
 from google.appengine.api import mail
 from google.appengine.api import memcache
+from google.appengine.api import taskqueue
+from google.appengine.ext import ndb
 
 from conference import ConferenceApi
+from conference import CACHED_ENDPOINTS
+import fieldstats
+import responsecache
+import seats
 #from models import Session
 import logging
 
@@ -28,6 +36,11 @@ class SetAnnouncementHandler(webapp2.RequestHandler):
         # use _cacheAnnouncement() to set announcement in Memcache
         ConferenceApi._cacheAnnouncement()
 
+class RefreshFieldStatsHandler(webapp2.RequestHandler):
+    def get(self):
+        """Resample the property values queryplanner estimates from."""
+        fieldstats.refresh()
+
 class SendConfirmationEmailHandler(webapp2.RequestHandler):
     def post(self):
         """Send email confirming Conference creation."""
@@ -52,9 +65,76 @@ class SetFeaturedSpeakerHandler(webapp2.RequestHandler):
         )
         self.response.set_status(204)
 
+class UpdateOrganizerNameHandler(webapp2.RequestHandler):
+    def post(self):
+        """Copy organizer's new displayName onto their Conferences."""
+        ConferenceApi._updateOrganizerDisplayName(self.request.get('userId'))
+        self.response.set_status(204)
+
+class RefreshSeatsHandler(webapp2.RequestHandler):
+    def post(self):
+        """Copy sharded seat count onto the Conference."""
+        seats.refresh(ndb.Key(urlsafe=self.request.get('websafeConferenceKey')))
+        self.response.set_status(204)
+
+class MigrateRegistrationsHandler(webapp2.RequestHandler):
+    def post(self):
+        """Move Profile registration & wishlist lists into entities,
+        one batch per task."""
+        cursor = ConferenceApi._migrateProfiles(self.request.get('cursor'))
+        if cursor:
+            taskqueue.add(params={'cursor': cursor},
+                url='/tasks/migrate_registrations'
+            )
+        self.response.set_status(204)
+
+    # lets an admin start the migration from a browser
+    get = post
+
+class MigrateSpeakersHandler(webapp2.RequestHandler):
+    def post(self):
+        """Backfill Session.speakerKey & Speaker aggregates, one batch
+        per task."""
+        cursor = ConferenceApi._migrateSessions(self.request.get('cursor'))
+        if cursor:
+            taskqueue.add(params={'cursor': cursor},
+                url='/tasks/migrate_speakers'
+            )
+        self.response.set_status(204)
+
+    # lets an admin start the migration from a browser
+    get = post
+
+class ExportAttendeesHandler(webapp2.RequestHandler):
+    def post(self):
+        """Write a conference's attendee roster to Cloud Storage."""
+        ConferenceApi._exportAttendees(self.request.get('websafeConferenceKey'))
+        self.response.set_status(204)
+
+class RefreshScheduleHandler(webapp2.RequestHandler):
+    def post(self):
+        """Rebuild a conference's agenda snapshot."""
+        ConferenceApi._refreshSchedule(self.request.get('websafeConferenceKey'))
+        self.response.set_status(204)
+
+class CacheStatsHandler(webapp2.RequestHandler):
+    def get(self):
+        """Report response cache hit/miss counts as JSON."""
+        self.response.headers['Content-Type'] = 'application/json'
+        self.response.write(json.dumps(
+            responsecache.stats(CACHED_ENDPOINTS)))
+
 
 app = webapp2.WSGIApplication([
     ('/crons/set_announcement', SetAnnouncementHandler),
+    ('/crons/refresh_field_stats', RefreshFieldStatsHandler),
     ('/tasks/send_confirmation_email', SendConfirmationEmailHandler),
     ('/tasks/get_featured_speaker', SetFeaturedSpeakerHandler),
+    ('/tasks/update_organizer_name', UpdateOrganizerNameHandler),
+    ('/tasks/refresh_seats', RefreshSeatsHandler),
+    ('/tasks/migrate_registrations', MigrateRegistrationsHandler),
+    ('/tasks/migrate_speakers', MigrateSpeakersHandler),
+    ('/tasks/export_attendees', ExportAttendeesHandler),
+    ('/tasks/refresh_schedule', RefreshScheduleHandler),
+    ('/admin/cache_stats', CacheStatsHandler),
 ], debug=True)
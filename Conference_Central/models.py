@@ -26,9 +26,20 @@ class Profile(ndb.Model):
     displayName             = ndb.StringProperty()
     mainEmail               = ndb.StringProperty()
     teeShirtSize            = ndb.StringProperty(default='NOT_SPECIFIED')
+    # legacy; moved to Registration & WishlistEntry children
     conferenceKeysToAttend  = ndb.StringProperty(repeated=True)
     sessionsToWishlist      = ndb.StringProperty(repeated=True)
 
+class Registration(ndb.Model):
+    """Registration -- Profile child, one per conference attended"""
+    conference              = ndb.KeyProperty(kind='Conference')
+    created                 = ndb.DateTimeProperty(auto_now_add=True)
+
+class WishlistEntry(ndb.Model):
+    """WishlistEntry -- Profile child, one per wishlisted session"""
+    session                 = ndb.KeyProperty(kind='Session')
+    created                 = ndb.DateTimeProperty(auto_now_add=True)
+
 class ProfileMiniForm(messages.Message):
     """ProfileMiniForm -- update Profile form message"""
     displayName         = messages.StringField(1)
@@ -42,6 +53,16 @@ class ProfileForm(messages.Message):
     conferenceKeysToAttend  = messages.StringField(4, repeated=True)
     sessionsToWishlist      = messages.StringField(5, repeated=True)
 
+class AttendeeForm(messages.Message):
+    """AttendeeForm -- conference attendee outbound form message"""
+    displayName             = messages.StringField(1)
+    mainEmail               = messages.StringField(2)
+
+class AttendeeForms(messages.Message):
+    """AttendeeForms -- multiple AttendeeForm outbound form message"""
+    items = messages.MessageField(AttendeeForm, 1, repeated=True)
+    nextPageToken = messages.StringField(2)
+
 class BooleanMessage(messages.Message):
     """BooleanMessage-- outbound Boolean value message"""
     data = messages.BooleanField(1)
@@ -58,6 +79,11 @@ class Conference(ndb.Model):
     endDate         = ndb.DateProperty()
     maxAttendees    = ndb.IntegerProperty()
     seatsAvailable  = ndb.IntegerProperty()
+    organizerDisplayName = ndb.StringProperty(indexed=False)
+
+class SeatShard(ndb.Model):
+    """SeatShard -- one slice of a Conference's free seats"""
+    seats           = ndb.IntegerProperty(default=0, indexed=False)
 
 class ConferenceForm(messages.Message):
     """ConferenceForm -- Conference outbound form message"""
@@ -74,9 +100,20 @@ class ConferenceForm(messages.Message):
     websafeKey      = messages.StringField(11)
     organizerDisplayName = messages.StringField(12)
 
+class QueryPlanForm(messages.Message):
+    """QueryPlanForm -- queryConferences explain outbound form message"""
+    datastoreFilters    = messages.StringField(1, repeated=True)
+    residualFilters     = messages.StringField(2, repeated=True)
+    orderBy             = messages.StringField(3, repeated=True)
+    index               = messages.StringField(4)
+    estimatedMatches    = messages.IntegerField(5)
+    estimatedScanned    = messages.IntegerField(6)
+
 class ConferenceForms(messages.Message):
     """ConferenceForms -- multiple Conference outbound form message"""
     items = messages.MessageField(ConferenceForm, 1, repeated=True)
+    nextPageToken = messages.StringField(2)
+    plan = messages.MessageField(QueryPlanForm, 3)
 
 class Session(ndb.Model):
     """Session -- session object"""
@@ -87,6 +124,27 @@ class Session(ndb.Model):
     typeOfSession   = ndb.StringProperty(repeated=True)
     date            = ndb.DateProperty()
     startTime       = ndb.TimeProperty(auto_now_add=True)
+    speakerKey      = ndb.KeyProperty(kind='Speaker')
+
+class Speaker(ndb.Model):
+    """Speaker -- keyed by normalized name"""
+    name            = ndb.StringProperty(indexed=False)
+    sessionCount    = ndb.IntegerProperty(default=0)
+
+class Migration(ndb.Model):
+    """Migration -- marks a finished data migration, keyed by name"""
+    finished        = ndb.DateTimeProperty(auto_now_add=True)
+
+class FieldStats(ndb.Model):
+    """FieldStats -- sampled property values of one kind, keyed by kind"""
+    samples         = ndb.PickleProperty()
+    updated         = ndb.DateTimeProperty(auto_now=True)
+
+class SpeakerConference(ndb.Model):
+    """SpeakerConference -- a Speaker's sessions at one conference"""
+    conference      = ndb.KeyProperty(kind='Conference')
+    sessions        = ndb.KeyProperty(kind='Session', repeated=True, indexed=False)
+    sessionNames    = ndb.StringProperty(repeated=True, indexed=False)
 
 class SessionForm(messages.Message):
     """SessionForm -- populates the session object"""
@@ -99,9 +157,37 @@ class SessionForm(messages.Message):
     startTime       = messages.StringField(7) #DateTimeField()
     seshWebSafeKey  = messages.StringField(8)
 
+class ScheduleSnapshot(ndb.Model):
+    """ScheduleSnapshot -- compressed agenda blob, keyed by conference"""
+    data            = ndb.BlobProperty()
+    updated         = ndb.DateTimeProperty(auto_now=True)
+
 class SessionForms(messages.Message):
     """SessionForms -- multiple Sessions outbound form message"""
     items = messages.MessageField(SessionForm, 1, repeated=True)
+    nextPageToken = messages.StringField(2)
+
+class ConflictForm(messages.Message):
+    """ConflictForm -- wishlist sessions whose times overlap"""
+    seshWebSafeKeys = messages.StringField(1, repeated=True)
+
+class AgendaForm(messages.Message):
+    """AgendaForm -- a wishlist in time order, with its conflicts and a
+    suggested conflict-free subset"""
+    items = messages.MessageField(SessionForm, 1, repeated=True)
+    conflicts = messages.MessageField(ConflictForm, 2, repeated=True)
+    suggested = messages.StringField(3, repeated=True)
+
+class ScheduleGroupForm(messages.Message):
+    """ScheduleGroupForm -- one session type's part of an agenda"""
+    typeOfSession = messages.StringField(1)
+    items = messages.MessageField(SessionForm, 2, repeated=True)
+
+class ScheduleForm(messages.Message):
+    """ScheduleForm -- a conference's agenda, grouped by session type"""
+    websafeConferenceKey = messages.StringField(1)
+    groups = messages.MessageField(ScheduleGroupForm, 2, repeated=True)
+    updated = messages.StringField(3)
 
 class TeeShirtSize(messages.Enum):
     """TeeShirtSize -- t-shirt size enumeration value"""
@@ -130,6 +216,10 @@ class ConferenceQueryForm(messages.Message):
 class ConferenceQueryForms(messages.Message):
     """ConferenceQueryForms -- multiple ConferenceQueryForm inbound form message"""
     filters = messages.MessageField(ConferenceQueryForm, 1, repeated=True)
+    pageSize = messages.IntegerField(2, variant=messages.Variant.INT32)
+    pageToken = messages.StringField(3)
+    explain = messages.BooleanField(4)
+    view = messages.StringField(5)
 
 class StringMessage(messages.Message):
     """StringMessage-- outbound (single) string message"""
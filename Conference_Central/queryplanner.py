@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+
+"""queryplanner.py
+
+Plans conference & session queries whose filters the datastore can't
+run on its own: inequality filters on more than one property.
+
+Every equality filter and the inequality filters on one property are
+pushed to the datastore. The inequality filters on the other properties
+are evaluated in Python over the query's batches. The pushed property
+is the one the cost model expects to be the most selective, so the
+fewest entities are scanned for the in-memory part.
+
+The cost model estimates a property's selectivity from a sorted sample
+of its values (see fieldstats.py): the fraction of the sample passing
+that property's filters. Properties without a sample fall back to a
+per-operator guess, which can't tell one property from another.
+
+"""
+
+import operator
+
+# rough fraction of entities a single filter lets through, for
+# properties with no sampled values
+OPERATOR_SELECTIVITY = {
+    '=':  0.1,
+    '<':  0.33,
+    '<=': 0.33,
+    '>':  0.33,
+    '>=': 0.33,
+    '!=': 0.9,
+}
+
+_COMPARATORS = {
+    '=':  operator.eq,
+    '<':  operator.lt,
+    '<=': operator.le,
+    '>':  operator.gt,
+    '>=': operator.ge,
+    '!=': operator.ne,
+}
+
+
+class QueryPlan(object):
+    """QueryPlan -- how to run one set of formatted filters"""
+
+    def __init__(self, datastore_filters, inequality_field, residual,
+                 tiebreak=('name',), stats=None):
+        self.datastore_filters = datastore_filters
+        self.inequality_field = inequality_field
+        self.residual = residual
+        self.tiebreak = tiebreak
+        self.stats = stats
+
+    @property
+    def selectivity(self):
+        """Estimated fraction of entities the datastore part returns."""
+        return selectivity(self.datastore_filters, self.stats)
+
+    @property
+    def residual_selectivity(self):
+        """Estimated fraction of those the in-memory part lets through."""
+        return selectivity(self.residual, self.stats)
+
+    @property
+    def order(self):
+        """Sort order the datastore query uses."""
+        if self.inequality_field:
+            return [self.inequality_field] + [field for field in self.tiebreak
+                                              if field != self.inequality_field]
+        return list(self.tiebreak)
+
+    @property
+    def index(self):
+        """Properties of the composite index the datastore part needs,
+        or None if the built-in indexes serve it.
+        """
+        fields = sorted(set(filtr["field"] for filtr in self.datastore_filters
+                            if filtr["operator"] == '='))
+        properties = fields + [field for field in self.order if field not in fields]
+        return properties if len(properties) > 1 else None
+
+    def matches(self, entity):
+        """Return True if entity passes the in-memory filters."""
+        for filtr in self.residual:
+            value = getattr(entity, filtr["field"])
+            compare = _COMPARATORS[filtr["operator"]]
+            # repeated properties match if any value does, as in the
+            # datastore; a missing value matches nothing (and comparing a
+            # date or time with None raises in Python 2)
+            values = value if isinstance(value, list) else [value]
+            if not any(compare(v, filtr["value"]) for v in values
+                       if v is not None):
+                return False
+        return True
+
+
+def _sampleSelectivity(filters, sample):
+    """Return the fraction of sample (one field's values) passing all
+    filters on that field, never quite 0."""
+    passing = sum(1 for v in sample
+                  if all(_COMPARATORS[filtr["operator"]](v, filtr["value"])
+                         for filtr in filters))
+    return max(passing, 0.5) / float(len(sample))
+
+
+def selectivity(filters, stats=None):
+    """Estimate the fraction of entities matching all filters.
+
+    stats maps field names to sorted samples of their values; filters on
+    different fields are taken to be independent.
+    """
+    stats = stats or {}
+    by_field = {}
+    for filtr in filters:
+        by_field.setdefault(filtr["field"], []).append(filtr)
+
+    estimate = 1.0
+    for field, field_filters in by_field.iteritems():
+        sample = stats.get(field)
+        if sample and all(filtr["value"] is not None for filtr in field_filters):
+            estimate *= _sampleSelectivity(field_filters, sample)
+        else:
+            for filtr in field_filters:
+                estimate *= OPERATOR_SELECTIVITY[filtr["operator"]]
+    return estimate
+
+
+def plan(filters, tiebreak=('name',), stats=None, pushed=None):
+    """Return the cheapest QueryPlan for a list of formatted filters,
+    ordered by the pushed inequality field (if any) then tiebreak.
+
+    stats, as for selectivity(), lets the cost model tell properties
+    apart; without it the choice only depends on the operators. pushed
+    names the inequality field to push regardless, e.g. to carry on
+    from a cursor made by an earlier plan.
+    """
+    equalities = [filtr for filtr in filters if filtr["operator"] == '=']
+    by_field = {}
+    for filtr in filters:
+        if filtr["operator"] != '=':
+            by_field.setdefault(filtr["field"], []).append(filtr)
+
+    if not by_field:
+        return QueryPlan(equalities, None, [], tiebreak, stats)
+
+    # push the inequality field that cuts the result set the most
+    if pushed not in by_field:
+        pushed = min(sorted(by_field),
+                     key=lambda field: selectivity(by_field[field], stats))
+    residual = [filtr for field in sorted(by_field) if field != pushed
+                for filtr in by_field[field]]
+    return QueryPlan(equalities + by_field[pushed], pushed, residual,
+                     tiebreak, stats)
+
+
+def indexYaml(properties, kind='Conference', ancestor=False):
+    """Return an index.yaml entry for a composite index."""
+    return '- kind: %s\n%s  properties:\n%s\n' % (
+        kind, '  ancestor: yes\n' if ancestor else '',
+        '\n'.join('  - name: %s' % prop for prop in properties))
+
+
+def requiredIndexes(fields, inequality_fields=None, tiebreak=('name',)):
+    """Return every composite index queries planned over fields can need.
+
+    Only one inequality field ever reaches the datastore, so that is one
+    index per (set of equality fields, optional inequality field) pair,
+    rather than one per combination of all the filters. Equality filters
+    may use any of fields, inequalities any of inequality_fields
+    (default: fields too).
+    """
+    indexes = []
+    fields = sorted(fields)
+    if inequality_fields is None:
+        inequality_fields = fields
+    for mask in range(1 << len(fields)):
+        equalities = [{"field": field, "operator": '=', "value": None}
+                      for i, field in enumerate(fields) if mask & (1 << i)]
+        used = set(filtr["field"] for filtr in equalities)
+        for inequality in [None] + [field for field in sorted(inequality_fields)
+                                    if field not in used]:
+            filters = list(equalities)
+            if inequality:
+                filters.append({"field": inequality, "operator": '>', "value": None})
+            index = plan(filters, tiebreak).index
+            if index and index not in indexes:
+                indexes.append(index)
+    return indexes
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+"""responsecache.py
+
+Memcache cache of serialized endpoint responses for read-heavy public
+endpoints.
+
+Entries are keyed by endpoint, normalized request parameters and the
+current value of one or more generation counters. Writers bump the
+counters of the scopes they touch, which orphans the old entries
+instead of having to find and delete them. Hits and misses are counted
+per endpoint in memcache.
+
+"""
+
+import hashlib
+import time
+
+from google.appengine.api import memcache
+from protorpc import protobuf
+
+GEN_PREFIX = "RESP_GEN_"
+RESP_PREFIX = "RESP_"
+STATS_PREFIX = "RESP_STATS_"
+RESPONSE_TTL = 60 * 60
+
+# scope bumped by anything that changes sessions across conferences
+SESSIONS_SCOPE = "sessions"
+# scope bumped by anything that changes which conferences a query matches
+CONFERENCES_SCOPE = "conferences"
+
+
+def conferenceScope(websafeConferenceKey):
+    """Return the scope covering one conference & its sessions."""
+    return "conf_%s" % websafeConferenceKey
+
+
+def _generations(scopes):
+    """Return the current generation of each scope, seeding missing ones.
+
+    A counter evicted from memcache restarts at the current time rather
+    than zero, so entries cached under an older generation stay orphaned.
+    """
+    keys = [GEN_PREFIX + scope for scope in scopes]
+    gens = memcache.get_multi(keys)
+    missing = [key for key in keys if key not in gens]
+    if missing:
+        now = int(time.time() * 1000)
+        memcache.add_multi(dict((key, now) for key in missing))
+        gens.update(memcache.get_multi(missing))
+    return [gens.get(key, 0) for key in keys]
+
+
+def bump(*scopes):
+    """Invalidate every cached response depending on any of scopes."""
+    memcache.offset_multi(dict((GEN_PREFIX + scope, 1) for scope in scopes),
+                          initial_value=int(time.time() * 1000))
+
+
+def cachedValue(endpoint, scopes, params, build, ttl=RESPONSE_TTL):
+    """Return the cached value for endpoint & params, calling build() to
+    produce (and cache) it on a miss. The value must be picklable.
+
+    params must already be normalized (e.g. dates parsed & reformatted)
+    so equivalent requests share an entry.
+    """
+    key = RESP_PREFIX + hashlib.sha1(
+        repr((endpoint, _generations(scopes), params))).hexdigest()
+
+    value = memcache.get(key)
+    if value is not None:
+        memcache.incr(STATS_PREFIX + endpoint + "_hit", initial_value=0)
+        return value
+
+    memcache.incr(STATS_PREFIX + endpoint + "_miss", initial_value=0)
+    value = build()
+    memcache.set(key, value, time=ttl)
+    return value
+
+
+def cached(endpoint, scopes, params, message_cls, build):
+    """Return the cached message_cls response for endpoint & params,
+    calling build() to produce (and cache) it on a miss.
+    """
+    data = cachedValue(endpoint, scopes, params,
+                       lambda: protobuf.encode_message(build()))
+    return protobuf.decode_message(message_cls, data)
+
+
+def stats(endpoints):
+    """Return {endpoint: {'hit': n, 'miss': n}} for the given endpoints."""
+    keys = [STATS_PREFIX + endpoint + suffix
+            for endpoint in endpoints for suffix in ("_hit", "_miss")]
+    counts = memcache.get_multi(keys)
+    return dict((endpoint, {
+        'hit': counts.get(STATS_PREFIX + endpoint + "_hit", 0),
+        'miss': counts.get(STATS_PREFIX + endpoint + "_miss", 0),
+    }) for endpoint in endpoints)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+"""schedule.py
+
+Precomputed per-conference agenda snapshots.
+
+A conference's sessions are serialized once, sorted by date & startTime
+and grouped by type, into a compressed ScheduleForm blob. The blob is
+kept in memcache and in a ScheduleSnapshot root entity, so an agenda
+read is a single memcache (or datastore) get instead of a query plus a
+conversion per session. Snapshots are rebuilt by a deduplicated task
+after sessions are written, so they lag writes by up to REFRESH_DELAY
+seconds.
+
+"""
+
+import time
+import zlib
+
+from google.appengine.api import memcache
+from google.appengine.api import taskqueue
+from google.appengine.ext import ndb
+from protorpc import protobuf
+
+from models import ScheduleSnapshot, ScheduleForm, ScheduleGroupForm
+
+MEMCACHE_PREFIX = "SCHEDULE_"
+MEMCACHE_TTL = 24 * 60 * 60
+REFRESH_DELAY = 10
+
+
+def snapshotKey(websafeConferenceKey):
+    """Return the ScheduleSnapshot key for a conference."""
+    return ndb.Key(ScheduleSnapshot, websafeConferenceKey)
+
+
+def encode(websafeConferenceKey, session_forms):
+    """Return the compressed agenda blob for a conference's SessionForms.
+
+    Sessions with several types appear in each of their groups; sessions
+    with none are grouped last, under no type.
+    """
+    groups = {}
+    for sf in session_forms:
+        for sesh_type in sf.typeOfSession or [None]:
+            groups.setdefault(sesh_type, []).append(sf)
+
+    form = ScheduleForm(
+        websafeConferenceKey=websafeConferenceKey,
+        updated=time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+    )
+    for sesh_type in sorted(groups, key=lambda t: (t is None, t)):
+        form.groups.append(ScheduleGroupForm(
+            typeOfSession=sesh_type,
+            items=sorted(groups[sesh_type],
+                         key=lambda sf: (sf.date, sf.startTime, sf.name)),
+        ))
+    return zlib.compress(protobuf.encode_message(form))
+
+
+def decode(data):
+    """Return the ScheduleForm held in an agenda blob."""
+    return protobuf.decode_message(ScheduleForm, zlib.decompress(data))
+
+
+def store(websafeConferenceKey, data):
+    """Save an agenda blob to the datastore & memcache."""
+    ScheduleSnapshot(key=snapshotKey(websafeConferenceKey), data=data).put()
+    memcache.set(MEMCACHE_PREFIX + websafeConferenceKey, data,
+                 time=MEMCACHE_TTL)
+
+
+def load(websafeConferenceKey):
+    """Return a conference's agenda blob, or None if it was never built."""
+    data = memcache.get(MEMCACHE_PREFIX + websafeConferenceKey)
+    if data is not None:
+        return data
+
+    snapshot = snapshotKey(websafeConferenceKey).get()
+    if not snapshot:
+        return None
+    memcache.set(MEMCACHE_PREFIX + websafeConferenceKey, snapshot.data,
+                 time=MEMCACHE_TTL)
+    return snapshot.data
+
+
+def scheduleRefresh(websafeConferenceKey):
+    """Enqueue one rebuild task per conference per REFRESH_DELAY window.
+
+    The first task in a window runs after the window closes, so it sees
+    every session written during it.
+    """
+    name = 'schedule-%s-%d' % (websafeConferenceKey,
+                               int(time.time() / REFRESH_DELAY))
+    try:
+        taskqueue.add(name=name, countdown=REFRESH_DELAY,
+            params={'websafeConferenceKey': websafeConferenceKey},
+            url='/tasks/refresh_schedule'
+        )
+    except (taskqueue.TaskAlreadyExistsError, taskqueue.TombstonedTaskError):
+        pass
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+
+"""seats.py
+
+Sharded seat counter for conference registration.
+
+A conference's free seats are split across NUM_SHARDS SeatShard root
+entities, so concurrent registrations take seats from different entity
+groups instead of all rewriting the Conference. No shard ever goes below
+zero, and capacity can't be cut below the seats already taken, so the
+conference can never be oversold. Conference.seatsAvailable
+becomes a cached aggregate, refreshed by a deduplicated task after a
+burst of registrations.
+
+"""
+
+import random
+import time
+
+from google.appengine.api import taskqueue
+from google.appengine.ext import ndb
+
+from models import ConflictException, SeatShard
+import responsecache
+
+# conference + all shards must fit in one XG transaction (max 25 groups)
+NUM_SHARDS = 20
+REFRESH_DELAY = 10
+
+
+def shardKeys(conf_key):
+    """Return the SeatShard keys for a conference."""
+    wsck = conf_key.urlsafe()
+    return [ndb.Key(SeatShard, '%s-%d' % (wsck, i)) for i in range(NUM_SHARDS)]
+
+
+def _split(total):
+    """Split total seats as evenly as possible across the shards."""
+    base, extra = divmod(max(total, 0), NUM_SHARDS)
+    return [base + (1 if i < extra else 0) for i in range(NUM_SHARDS)]
+
+
+@ndb.transactional(xg=True)
+def _initShards(conf_key):
+    """Create a conference's shards from its current seatsAvailable."""
+    keys = shardKeys(conf_key)
+    shards = ndb.get_multi(keys)
+    if all(shards):
+        return shards
+
+    conf = conf_key.get()
+    shards = [SeatShard(key=key, seats=seats)
+              for key, seats in zip(keys, _split(conf.seatsAvailable or 0))]
+    ndb.put_multi(shards)
+    return shards
+
+
+def getShards(conf_key):
+    """Return a conference's shards, creating them on first use."""
+    shards = ndb.get_multi(shardKeys(conf_key))
+    if not all(shards):
+        shards = _initShards(conf_key)
+    return shards
+
+
+def shardsWithSeats(conf_key):
+    """Return keys of shards that had free seats, in random order."""
+    keys = [shard.key for shard in getShards(conf_key) if shard.seats > 0]
+    random.shuffle(keys)
+    return keys
+
+
+def anyShard(conf_key):
+    """Return a random shard key to give a seat back to."""
+    getShards(conf_key)
+    return random.choice(shardKeys(conf_key))
+
+
+def newTotal(free, delta):
+    """Return the free seats after adding delta seats to free, refusing
+    to take away seats that are already taken."""
+    if free + delta < 0:
+        raise ConflictException(
+            "Only %d seats are free; maxAttendees can't drop by %d."
+            % (free, -delta))
+    return free + delta
+
+
+@ndb.transactional(xg=True)
+def resize(conf_key, delta):
+    """Add delta seats (possibly negative) and rebalance across shards.
+
+    Must be called with the Conference in the same transaction; if the
+    shards don't exist yet, seatsAvailable on the Conference is still
+    the source of truth and the caller adjusts that instead.
+    Returns the new total, or None if there are no shards; raises
+    ConflictException if that would take away seats already taken.
+    """
+    shards = ndb.get_multi(shardKeys(conf_key))
+    if not all(shards):
+        return None
+    total = newTotal(sum(shard.seats for shard in shards), delta)
+    for shard, seats in zip(shards, _split(total)):
+        shard.seats = seats
+    ndb.put_multi(shards)
+    return total
+
+
+def refresh(conf_key):
+    """Write the shard total to Conference.seatsAvailable, rebalancing
+    the shards if some have run dry while others still have seats.
+
+    Registrations only change the shards, so this is where the
+    Conference's cached responses go stale.
+    """
+    total, changed = _refresh(conf_key)
+    if changed:
+        responsecache.bump(responsecache.conferenceScope(conf_key.urlsafe()))
+    return total
+
+
+@ndb.transactional(xg=True)
+def _refresh(conf_key):
+    """Return (total, whether the Conference changed)."""
+    shards = ndb.get_multi(shardKeys(conf_key))
+    if not all(shards):
+        return None, False
+    total = sum(shard.seats for shard in shards)
+    if total >= NUM_SHARDS and not all(shard.seats for shard in shards):
+        for shard, seats in zip(shards, _split(total)):
+            shard.seats = seats
+        ndb.put_multi(shards)
+
+    conf = conf_key.get()
+    if conf and conf.seatsAvailable != total:
+        conf.seatsAvailable = total
+        conf.put()
+        return total, True
+    return total, False
+
+
+def scheduleRefresh(conf_key):
+    """Enqueue one refresh task per conference per REFRESH_DELAY window."""
+    wsck = conf_key.urlsafe()
+    name = 'seats-%s-%d' % (wsck, int(time.time() / REFRESH_DELAY))
+    try:
+        taskqueue.add(name=name, countdown=REFRESH_DELAY,
+            params={'websafeConferenceKey': wsck},
+            url='/tasks/refresh_seats'
+        )
+    except (taskqueue.TaskAlreadyExistsError, taskqueue.TombstonedTaskError):
+        pass
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+
+"""speakers.py
+
+Speaker entities keyed by a normalized speaker name, so that "Jane Doe"
+and "jane  doe" are one speaker.
+
+Each Speaker has one SpeakerConference child per conference it speaks
+at, holding the keys & names of its sessions there. Both are updated in
+one (single entity group) transaction by the featured speaker task that
+follows session writes, so a speaker's sessions and the featured speaker
+check are key reads rather than queries on Session.speaker, and a busy
+speaker's entity group never fails a session write. Recording the same
+session twice is a no-op, which keeps the counts right when a task or
+migration retries.
+
+Sessions written before Speakers existed only reach the aggregates via
+the backfill (/tasks/migrate_speakers). Until it has finished, the
+aggregates may be missing a speaker's older sessions, so readers check
+backfilled() and fall back to querying Session.speaker.
+
+Featured speaker checks are coalesced into one named task per
+conference & speaker per FEATURED_DELAY window, so importing many
+sessions for one speaker recomputes the featured speaker once.
+
+"""
+
+import hashlib
+import time
+
+from google.appengine.api import taskqueue
+from google.appengine.ext import ndb
+
+from models import Migration, Session, Speaker, SpeakerConference
+import responsecache
+
+FEATURED_DELAY = 10
+BACKFILL_ID = 'speakers'
+BACKFILL_RECHECK = 60
+
+# once the backfill has finished it stays finished; until then the
+# marker is re-read at most every BACKFILL_RECHECK seconds
+_backfilled = False
+_checked = 0
+
+
+def normalize(name):
+    """Return the canonical form of a speaker name."""
+    return u' '.join(name.split()).lower()
+
+
+def speakerKey(name):
+    """Return the Speaker key for a speaker name, or None if blank."""
+    if not name or not name.split():
+        return None
+    return ndb.Key(Speaker, normalize(name))
+
+
+def conferenceKey(speaker_key, conf_key):
+    """Return the SpeakerConference key for a speaker & conference."""
+    return ndb.Key(SpeakerConference, conf_key.urlsafe(), parent=speaker_key)
+
+
+@ndb.transactional
+def record(name, conf_key, sessions):
+    """Add sessions (all by speaker name, in one conference) to the
+    speaker's aggregates, returning (SpeakerConference, number added).
+    """
+    s_key = speakerKey(name)
+    speaker, per_conf = ndb.get_multi([s_key, conferenceKey(s_key, conf_key)])
+    if not speaker:
+        speaker = Speaker(key=s_key, name=name)
+    if not per_conf:
+        per_conf = SpeakerConference(key=conferenceKey(s_key, conf_key),
+                                     conference=conf_key)
+
+    known = set(per_conf.sessions)
+    added = [sesh for sesh in sessions if sesh.key not in known]
+    if not added:
+        return per_conf, 0
+    per_conf.sessions.extend(sesh.key for sesh in added)
+    per_conf.sessionNames.extend(sesh.name for sesh in added)
+    speaker.sessionCount += len(added)
+    ndb.put_multi([speaker, per_conf])
+    return per_conf, len(added)
+
+
+def recordConference(name, conf_key):
+    """Add all of a conference's sessions by speaker name (or any variant
+    of it) to the speaker's aggregates, returning the SpeakerConference.
+    """
+    s_key = speakerKey(name)
+    # ancestor + equality only, so served by the built-in indexes
+    sessions = Session.query(Session.speakerKey == s_key, ancestor=conf_key)\
+        .fetch()
+    per_conf, added = record(name, conf_key, sessions)
+    if added:
+        # getSessionsBySpeaker reads the aggregates
+        responsecache.bump(responsecache.SESSIONS_SCOPE)
+    return per_conf
+
+
+def backfilled():
+    """Return True once the backfill has covered every older session."""
+    global _backfilled, _checked
+    if not _backfilled and time.time() - _checked >= BACKFILL_RECHECK:
+        _backfilled = ndb.Key(Migration, BACKFILL_ID).get() is not None
+        _checked = time.time()
+    return _backfilled
+
+
+def markBackfilled():
+    """Record that the backfill has finished."""
+    global _backfilled
+    Migration(id=BACKFILL_ID).put()
+    _backfilled = True
+
+
+def sessionKeys(name):
+    """Return the keys of every session by speaker name, or None until
+    the backfill has finished and the aggregates are complete."""
+    if not backfilled():
+        return None
+    s_key = speakerKey(name)
+    if not s_key:
+        return []
+    return [sesh_key
+            for per_conf in SpeakerConference.query(ancestor=s_key)
+            for sesh_key in per_conf.sessions]
+
+
+def scheduleFeatured(websafeConferenceKey, names):
+    """Enqueue a featured speaker check for each speaker name, at most
+    one per conference & speaker per FEATURED_DELAY window.
+
+    The first task in a window runs after the window closes, so it sees
+    every session written during it.
+    """
+    bucket = int(time.time() / FEATURED_DELAY)
+    tasks = []
+    for name in names:
+        # task names allow only [a-zA-Z0-9_-], so hash the speaker id
+        digest = hashlib.sha1((u'%s/%s' % (websafeConferenceKey,
+            speakerKey(name).id())).encode('utf-8')).hexdigest()
+        tasks.append(taskqueue.Task(
+            name='featured-%s-%d' % (digest, bucket),
+            countdown=FEATURED_DELAY,
+            url='/tasks/get_featured_speaker',
+            params={'websafeConferenceKey': websafeConferenceKey,
+                    'speaker': name},
+            method='GET',
+        ))
+
+    queue = taskqueue.Queue()
+    for i in xrange(0, len(tasks), taskqueue.MAX_TASKS_PER_ADD):
+        try:
+            # the other tasks in a batch are still added
+            queue.add(tasks[i:i + taskqueue.MAX_TASKS_PER_ADD])
+        except (taskqueue.TaskAlreadyExistsError, taskqueue.TombstonedTaskError):
+            pass
@@ -424,11 +424,16 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
     };
 
     /**
-     * Invokes the conference.queryConferences API.
+     * Invokes the conference.queryConferences API, following nextPageToken
+     * until every matching conference has been loaded.
      */
     $scope.queryConferencesAll = function () {
         var sendFilters = {
-            filters: []
+            filters: [],
+            // the table only shows a few columns
+            view: 'summary',
+            // fewest round trips the API allows
+            pageSize: 100
         }
         for (var i = 0; i < $scope.filters.length; i++) {
             var filter = $scope.filters[i];
@@ -441,31 +446,41 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
             }
         }
         $scope.loading = true;
-        gapi.client.conference.queryConferences(sendFilters).
-            execute(function (resp) {
-                $scope.$apply(function () {
-                    $scope.loading = false;
-                    if (resp.error) {
-                        // The request has failed.
-                        var errorMessage = resp.error.message || '';
-                        $scope.messages = 'Failed to query conferences : ' + errorMessage;
-                        $scope.alertStatus = 'warning';
-                        $log.error($scope.messages + ' filters : ' + JSON.stringify(sendFilters));
-                    } else {
-                        // The request has succeeded.
-                        $scope.submitted = false;
-                        $scope.messages = 'Query succeeded : ' + JSON.stringify(sendFilters);
-                        $scope.alertStatus = 'success';
-                        $log.info($scope.messages);
-
-                        $scope.conferences = [];
-                        angular.forEach(resp.items, function (conference) {
-                            $scope.conferences.push(conference);
-                        });
-                    }
-                    $scope.submitted = true;
+        $scope.conferences = [];
+        var queryPage = function (pageToken) {
+            sendFilters.pageToken = pageToken;
+            gapi.client.conference.queryConferences(sendFilters).
+                execute(function (resp) {
+                    $scope.$apply(function () {
+                        if (resp.error) {
+                            // The request has failed.
+                            $scope.loading = false;
+                            var errorMessage = resp.error.message || '';
+                            $scope.messages = 'Failed to query conferences : ' + errorMessage;
+                            $scope.alertStatus = 'warning';
+                            $log.error($scope.messages + ' filters : ' + JSON.stringify(sendFilters));
+                        } else {
+                            // The request has succeeded.
+                            angular.forEach(resp.items, function (conference) {
+                                $scope.conferences.push(conference);
+                            });
+                            if (resp.nextPageToken) {
+                                // pages can come back short or empty
+                                // while later ones still have matches
+                                queryPage(resp.nextPageToken);
+                                return;
+                            }
+                            $scope.loading = false;
+                            $scope.submitted = false;
+                            $scope.messages = 'Query succeeded : ' + JSON.stringify(sendFilters.filters);
+                            $scope.alertStatus = 'success';
+                            $log.info($scope.messages);
+                        }
+                        $scope.submitted = true;
+                    });
                 });
-            });
+        };
+        queryPage(undefined);
     }
 
     /**
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+
+"""bench_agenda.py
+
+Time agenda.conflicts() & agenda.best() on random sessions spread over
+three days, as getWishlistAgenda would call them on a huge wishlist.
+Nothing is read from the datastore.
+
+usage: python tests/bench_agenda.py [sessions]
+
+"""
+
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import testbase  # puts the app & SDK on sys.path
+
+import agenda
+
+DAYS = 3
+LENGTHS = [30, 45, 60, 90, 120]
+
+
+def makeIntervals(count):
+    """Return count random (start, end, item) intervals over DAYS days."""
+    day = datetime(2016, 1, 1)
+    intervals = []
+    for i in xrange(count):
+        start = day + timedelta(minutes=random.randrange(DAYS * 24 * 60))
+        intervals.append(
+            (start, start + timedelta(minutes=random.choice(LENGTHS)), i))
+    return intervals
+
+
+def main(count):
+    random.seed(2016)
+    intervals = makeIntervals(count)
+    print '%d sessions over %d days\n' % (count, DAYS)
+    print '  %-10s %8s %10s' % ('function', 'result', 'ms')
+    for func in (agenda.conflicts, agenda.best):
+        began = time.time()
+        result = func(intervals)
+        print '  %-10s %8d %10.1f' % (func.__name__, len(result),
+                                      (time.time() - began) * 1000)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
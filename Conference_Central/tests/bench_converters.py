@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+
+"""bench_converters.py
+
+Time copying entities into form messages two ways:
+
+  reflective -- the original _copy*ToForm loops: all_fields(), then
+                hasattr/getattr/setattr and endswith per field, per entity
+  copyToForm -- converters.copyToForm with its cached field plan
+
+Both copy the same in-memory Conferences and Sessions, and their forms
+must match. Nothing is read from the datastore.
+
+usage: python tests/bench_converters.py [entities]
+
+"""
+
+import random
+import sys
+import time
+from datetime import date, time as clock
+
+import testbase
+
+from google.appengine.ext import ndb
+
+from conference import CONFERENCE_TRANSFORMS, SESSION_TRANSFORMS
+from converters import copyToForm
+from models import Conference, ConferenceForm, Profile, Session, SessionForm
+
+CITIES = ['London', 'Paris', 'Berlin', 'Madrid', 'Rome']
+TOPICS = ['Python', 'Web', 'Data', 'Mobile', 'Cloud', 'Security']
+TYPES = ['lecture', 'workshop', 'keynote']
+
+
+def reflectiveConference(conf):
+    """The original _copyConferenceToForm loop."""
+    cf = ConferenceForm()
+    for field in cf.all_fields():
+        if hasattr(conf, field.name):
+            # convert Date to date string; just copy others
+            if field.name.endswith('Date'):
+                setattr(cf, field.name, str(getattr(conf, field.name)))
+            else:
+                setattr(cf, field.name, getattr(conf, field.name))
+        elif field.name == "websafeKey":
+            setattr(cf, field.name, conf.key.urlsafe())
+    cf.check_initialized()
+    return cf
+
+
+def reflectiveSession(sesh):
+    """The original _copySessionToForm loop."""
+    sf = SessionForm()
+    for field in sf.all_fields():
+        if hasattr(sesh, field.name):
+            # convert Time or Date to date string; just copy others
+            if field.name.endswith(('startTime', 'date')):
+                setattr(sf, field.name, str(getattr(sesh, field.name)))
+            else:
+                setattr(sf, field.name, getattr(sesh, field.name))
+        elif field.name == "seshWebSafeKey":
+            setattr(sf, field.name, sesh.key.urlsafe())
+    sf.check_initialized()
+    return sf
+
+
+def plannedConference(conf):
+    return copyToForm(conf, ConferenceForm, CONFERENCE_TRANSFORMS,
+                      key_field='websafeKey')
+
+
+def plannedSession(sesh):
+    return copyToForm(sesh, SessionForm, SESSION_TRANSFORMS,
+                      key_field='seshWebSafeKey')
+
+
+def makeEntities(count):
+    """Return count unsaved Conferences and count Sessions, keyed."""
+    organizer = ndb.Key(Profile, 'organizer@example.com')
+    confs = []
+    sessions = []
+    for i in xrange(count):
+        month = random.randint(1, 12)
+        seats = random.randint(10, 1000)
+        conf = Conference(
+            key=ndb.Key(Conference, i + 1, parent=organizer),
+            name='Conference %05d' % i,
+            description='Conference number %d' % i,
+            organizerUserId='organizer@example.com',
+            topics=random.sample(TOPICS, 2),
+            city=random.choice(CITIES),
+            startDate=date(2016, month, 1),
+            endDate=date(2016, month, 3),
+            month=month,
+            maxAttendees=seats,
+            seatsAvailable=seats,
+            organizerDisplayName='organizer',
+        )
+        confs.append(conf)
+        sessions.append(Session(
+            key=ndb.Key(Session, i + 1, parent=conf.key),
+            name='Session %05d' % i,
+            highlights='Highlights of session %d' % i,
+            speaker='Speaker %d' % random.randint(1, 100),
+            duration=random.choice([30, 60, 90]),
+            typeOfSession=[random.choice(TYPES)],
+            date=conf.startDate,
+            startTime=clock(random.randint(8, 18)),
+        ))
+    return confs, sessions
+
+
+def timeCopy(copy, entities):
+    began = time.time()
+    forms = [copy(entity) for entity in entities]
+    return forms, (time.time() - began) * 1000
+
+
+def main(count):
+    tb = testbase.activateTestbed()
+    try:
+        random.seed(2016)
+        confs, sessions = makeEntities(count)
+        print '%d entities of each kind\n' % count
+        print '  %-12s %-12s %10s %10s' % ('kind', 'copy', 'ms', 'us/entity')
+
+        for kind, entities, reflective, planned in [
+                ('Conference', confs, reflectiveConference, plannedConference),
+                ('Session', sessions, reflectiveSession, plannedSession)]:
+            expected = None
+            for name, copy in [('reflective', reflective),
+                               ('copyToForm', planned)]:
+                forms, elapsed = timeCopy(copy, entities)
+                if expected is None:
+                    expected = forms
+                elif forms != expected:
+                    raise AssertionError('%s forms differ for %s' % (name, kind))
+                print '  %-12s %-12s %10.1f %10.2f' % (
+                    kind, name, elapsed, elapsed * 1000 / count)
+    finally:
+        tb.deactivate()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
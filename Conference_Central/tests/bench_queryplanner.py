@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+
+"""bench_queryplanner.py
+
+Compare queryConferences' hybrid plans with other ways of running
+filters that have inequalities on more than one field, on random
+conferences in the testbed datastore:
+
+  planner      -- queryplanner.plan() with sampled field stats
+  no stats     -- the same with only the per-operator guesses
+  push <field> -- the same, forcing each inequality field to be pushed
+  intersect    -- pure datastore: one keys-only query per inequality
+                  field, keys intersected in memory, then one get_multi
+
+Each plan fetches every match, MAX_PAGE_SIZE at a time, from cold
+caches. Entities read counts what the datastore returned to queries
+(keys for keys-only queries); RPCs counts datastore calls. The run
+fails if the planner reads more than MAX_REGRET times what the best
+forced push reads.
+
+usage: python tests/bench_queryplanner.py [conferences]
+
+"""
+
+import random
+import sys
+import time
+
+import testbase
+
+from google.appengine.datastore.datastore_query import Cursor
+from google.appengine.ext import ndb
+
+from conference import MAX_PAGE_SIZE
+from models import Conference
+import fieldstats
+import queryplanner
+
+CITIES = ['London', 'Paris', 'Berlin', 'Madrid', 'Rome']
+TOPICS = ['Python', 'Web', 'Data', 'Mobile', 'Cloud', 'Security']
+MAX_REGRET = 1.5
+
+FILTER_SETS = [
+    ('month > 6, maxAttendees < 100', [
+        ('month', '>', 6), ('maxAttendees', '<', 100)]),
+    ('month > 10, maxAttendees > 200', [
+        ('month', '>', 10), ('maxAttendees', '>', 200)]),
+    ('city = Paris, month <= 3, maxAttendees >= 500', [
+        ('city', '=', 'Paris'), ('month', '<=', 3), ('maxAttendees', '>=', 500)]),
+    ('topics = Data, month != 6, maxAttendees < 50', [
+        ('topics', '=', 'Data'), ('month', '!=', 6), ('maxAttendees', '<', 50)]),
+]
+
+
+def populate(count):
+    """Store count random conferences."""
+    organizer = ndb.Key('Profile', 'organizer@example.com')
+    confs = []
+    for i in xrange(count):
+        max_attendees = int(random.expovariate(1 / 200.0)) + 10
+        confs.append(Conference(
+            parent=organizer,
+            name='Conference %05d' % i,
+            city=random.choice(CITIES),
+            topics=random.sample(TOPICS, 2),
+            month=random.randint(1, 12),
+            maxAttendees=max_attendees,
+            seatsAvailable=max_attendees,
+            organizerDisplayName='organizer',
+        ))
+    for i in xrange(0, count, 500):
+        ndb.put_multi(confs[i:i + 500])
+
+
+def fetchAll(api, query_plan, keys_only=True):
+    """Return every key a QueryPlan matches, a page at a time."""
+    keys = []
+    cursor = None
+    while True:
+        page, token = api._fetchPage(api._getQuery(query_plan), query_plan,
+                                     MAX_PAGE_SIZE, cursor, keys_only)
+        keys.extend(page)
+        if not token:
+            return keys
+        cursor = Cursor(urlsafe=token)
+
+
+def forced(filters, field):
+    """Return the QueryPlan pushing field's inequalities to the datastore."""
+    equalities = [filtr for filtr in filters if filtr["operator"] == '=']
+    pushed = [filtr for filtr in filters
+              if filtr["operator"] != '=' and filtr["field"] == field]
+    residual = [filtr for filtr in filters
+                if filtr["operator"] != '=' and filtr["field"] != field]
+    return queryplanner.QueryPlan(equalities + pushed, field, residual)
+
+
+def planner(stats):
+    def run(api, filters):
+        return ndb.get_multi(fetchAll(api, queryplanner.plan(filters,
+                                                             stats=stats)))
+    return run
+
+
+def pushing(field):
+    def run(api, filters):
+        return ndb.get_multi(fetchAll(api, forced(filters, field)))
+    return run
+
+
+def intersect(api, filters):
+    equalities = [filtr for filtr in filters if filtr["operator"] == '=']
+    fields = sorted(set(filtr["field"] for filtr in filters
+                        if filtr["operator"] != '='))
+    keys = None
+    for field in fields:
+        # the datastore part alone: nothing left to check in memory
+        plan = forced(equalities + [filtr for filtr in filters
+                                    if filtr["field"] == field], field)
+        matched = set(fetchAll(api, plan))
+        keys = matched if keys is None else keys & matched
+    return ndb.get_multi(list(keys))
+
+
+def main(count):
+    tb = testbase.activateTestbed()
+    try:
+        from conference import ConferenceApi
+        api = ConferenceApi()
+        random.seed(2016)
+        populate(count)
+        fieldstats.refresh()
+        stats = fieldstats.get(Conference)
+        print '%d conferences\n' % count
+
+        for label, spec in FILTER_SETS:
+            filters = [{"field": field, "operator": op, "value": value}
+                       for field, op, value in spec]
+            chosen = queryplanner.plan(filters, stats=stats).inequality_field
+            guessed = queryplanner.plan(filters).inequality_field
+            strategies = [('planner (pushes %s)' % chosen, planner(stats)),
+                          ('no stats (pushes %s)' % guessed, planner(None))]
+            for field in sorted(set(f["field"] for f in filters
+                                    if f["operator"] != '=')):
+                strategies.append(('push %s' % field, pushing(field)))
+            strategies.append(('intersect', intersect))
+
+            print label
+            print '  %-28s %8s %8s %6s %8s' % (
+                'plan', 'matches', 'read', 'RPCs', 'ms')
+            expected = None
+            reads = {}
+            for name, run in strategies:
+                with testbase.countRpcs() as rpcs:
+                    began = time.time()
+                    confs = run(api, filters)
+                    elapsed = (time.time() - began) * 1000
+                keys = sorted(conf.key.urlsafe() for conf in confs)
+                if expected is None:
+                    expected = keys
+                elif keys != expected:
+                    raise AssertionError('%s disagrees with planner' % name)
+                reads[name] = rpcs.entities_read
+                print '  %-28s %8d %8d %6d %8.1f' % (
+                    name, len(keys), rpcs.entities_read, rpcs.datastore(),
+                    elapsed)
+            print
+
+            best = min(n for name, n in reads.items()
+                       if name.startswith('push '))
+            if reads[strategies[0][0]] > MAX_REGRET * best:
+                raise AssertionError('planner read %d, pushing the best '
+                                     'field reads %d' % (reads[strategies[0][0]], best))
+    finally:
+        tb.deactivate()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
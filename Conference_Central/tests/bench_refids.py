@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+
+"""bench_refids.py
+
+Compare the ways a profile's registrations & wishlist have been stored,
+for a profile with hundreds of entries:
+
+  urlsafe lists -- the legacy Profile.conferenceKeysToAttend &
+                   sessionsToWishlist strings, each decoded with
+                   ndb.Key(urlsafe=...) on every request
+  urlsafe ids   -- Registration/WishlistEntry children whose ids are the
+                   referenced key's urlsafe string
+  _refId ids    -- the same children with _refId ids, as stored now
+
+Sizes are encoded protobuf bytes. Every index row of a child entity
+repeats its key, so key bytes are paid again per row. Times are the
+best of REPEAT runs per request: turning what the datastore returns
+back into Keys, and building the child keys that registration &
+wishlist checks look up.
+
+usage: python tests/bench_refids.py [entries]
+
+"""
+
+import sys
+import time
+
+import testbase
+
+from google.appengine.ext import ndb
+
+from conference import _refId
+from models import Conference, Profile, Registration, Session, WishlistEntry
+
+REPEAT = 20
+EMAIL = 'attendee.with.a.long.address@example.com'
+
+
+def referenced(count):
+    """Return count Conference keys and a Session key in each."""
+    organizer = ndb.Key(Profile, 'organizer@example.com')
+    conf_keys = [ndb.Key(Conference, 5000000000000000 + i, parent=organizer)
+                 for i in xrange(count)]
+    sesh_keys = [ndb.Key(Session, 6000000000000000 + i, parent=conf_key)
+                 for i, conf_key in enumerate(conf_keys)]
+    return conf_keys, sesh_keys
+
+
+def children(p_key, conf_keys, sesh_keys, makeId):
+    return ([Registration(key=ndb.Key(Registration, makeId(k), parent=p_key),
+                          conference=k) for k in conf_keys] +
+            [WishlistEntry(key=ndb.Key(WishlistEntry, makeId(k), parent=p_key),
+                           session=k) for k in sesh_keys])
+
+
+def entityBytes(entities):
+    return sum(entity._to_pb().ByteSize() for entity in entities)
+
+
+def keyBytes(entities):
+    return sum(entity.key.reference().ByteSize() for entity in entities)
+
+
+def best(run):
+    """Return the fastest of REPEAT runs of run(), in ms."""
+    times = []
+    for _ in xrange(REPEAT):
+        began = time.time()
+        run()
+        times.append(time.time() - began)
+    return min(times) * 1000
+
+
+def main(count):
+    tb = testbase.activateTestbed()
+    try:
+        p_key = ndb.Key(Profile, EMAIL)
+        conf_keys, sesh_keys = referenced(count)
+        refs = conf_keys + sesh_keys
+        urlsafes = [k.urlsafe() for k in refs]
+        legacy = Profile(key=p_key, displayName='attendee', mainEmail=EMAIL,
+                         conferenceKeysToAttend=urlsafes[:count],
+                         sessionsToWishlist=urlsafes[count:])
+        by_urlsafe = children(p_key, conf_keys, sesh_keys,
+                              lambda k: k.urlsafe())
+        by_refid = children(p_key, conf_keys, sesh_keys, _refId)
+
+        def readLegacy():
+            pb = legacy._to_pb()
+            def run():
+                prof = Profile._from_pb(pb)
+                return [ndb.Key(urlsafe=s) for s in
+                        prof.conferenceKeysToAttend + prof.sessionsToWishlist]
+            return run
+
+        def readChildren(entities):
+            # the KeyProperty values come back as Keys: nothing to decode
+            pbs = [(type(entity), entity._to_pb()) for entity in entities]
+            def run():
+                return [cls._from_pb(pb) for cls, pb in pbs]
+            return run
+
+        def buildKeys(makeId):
+            def run():
+                return [ndb.Key(Registration, makeId(k), parent=p_key)
+                        for k in refs]
+            return run
+
+        print '%d registrations & %d wishlist entries\n' % (count, count)
+        print '  %-14s %12s %10s %10s %12s' % (
+            'layout', 'entity bytes', 'key bytes', 'read ms', 'key build ms')
+        print '  %-14s %12d %10s %10.2f %12s' % (
+            'urlsafe lists', entityBytes([legacy]), '-', best(readLegacy()), '-')
+        for name, entities, makeId in [
+                ('urlsafe ids', by_urlsafe, lambda k: k.urlsafe()),
+                ('_refId ids', by_refid, _refId)]:
+            print '  %-14s %12d %10d %10.2f %12.2f' % (
+                name, entityBytes(entities), keyBytes(entities),
+                best(readChildren(entities)), best(buildKeys(makeId)))
+
+        print '\n  per key: urlsafe id %d chars, _refId %d chars' % (
+            len(urlsafes[-1]), len(_refId(refs[-1])))
+    finally:
+        tb.deactivate()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+
+"""test_fieldstats.py
+
+fieldstats samples the values of the properties queries filter on, and
+serves them from memcache or the stored FieldStats.
+
+"""
+
+import unittest
+from datetime import date
+
+import testbase
+
+from google.appengine.api import memcache
+
+from models import Conference, Session
+import fieldstats
+
+
+class FieldStatsTest(testbase.TestCase):
+
+    def setUp(self):
+        super(FieldStatsTest, self).setUp()
+        for i in range(30):
+            testbase.makeConference('Conference %d' % i, city='Paris',
+                                    topics=['Web', 'Data'], month=i % 12 + 1,
+                                    maxAttendees=10 * i)
+        conf = testbase.makeConference('No month')
+        testbase.makeSessions(conf, 5, date=date(2016, 6, 2))
+
+    def testNoneBeforeRefresh(self):
+        self.assertEqual({}, fieldstats.get(Conference))
+
+    def testSamples(self):
+        fieldstats.refresh()
+        samples = fieldstats.get(Conference)
+        self.assertEqual(sorted(10 * i for i in range(30)),
+                         samples['maxAttendees'])
+        # missing values are left out
+        self.assertEqual(30, len(samples['month']))
+        # one row per value of a repeated property
+        self.assertEqual(['Data'] * 30 + ['Web'] * 30, samples['topics'])
+        self.assertEqual([date(2016, 6, 2)] * 5, fieldstats.get(Session)['date'])
+
+    def testThinnedToSamplePoints(self):
+        for i in range(fieldstats.SAMPLE_POINTS * 2):
+            testbase.makeConference('More %d' % i, maxAttendees=i)
+        fieldstats.refresh()
+        sample = fieldstats.get(Conference)['maxAttendees']
+        self.assertEqual(fieldstats.SAMPLE_POINTS, len(sample))
+        self.assertEqual(sorted(sample), sample)
+
+    def testServedFromTheEntity(self):
+        fieldstats.refresh()
+        memcache.flush_all()
+        self.assertEqual(sorted(10 * i for i in range(30)),
+                         fieldstats.get(Conference)['maxAttendees'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+
+"""test_organizer_name.py
+
+The update_organizer_name task copies a Profile's displayName onto its
+Conferences page by page, without overwriting changes made to them
+while it runs.
+
+"""
+
+import unittest
+
+import testbase
+
+from google.appengine.ext import ndb
+
+from conference import ConferenceApi
+from models import Profile
+
+ORGANIZER = 'organizer@example.com'
+
+
+class OrganizerNameTest(testbase.TestCase):
+
+    def setUp(self):
+        super(OrganizerNameTest, self).setUp()
+        self.p_key = ndb.Key(Profile, ORGANIZER)
+        Profile(key=self.p_key, displayName='Renamed', mainEmail=ORGANIZER).put()
+        self.confs = [testbase.makeConference('Conference %d' % i,
+                                              organizer=ORGANIZER)
+                      for i in range(5)]
+
+    def reread(self):
+        ndb.get_context().clear_cache()
+        return ndb.get_multi([conf.key for conf in self.confs])
+
+    def testEveryPage(self):
+        self.assertEqual(5, ConferenceApi._updateOrganizerDisplayName(
+            ORGANIZER, batch_size=2))
+        self.assertEqual(['Renamed'] * 5,
+                         [conf.organizerDisplayName for conf in self.reread()])
+        # nothing left to change
+        self.assertEqual(0, ConferenceApi._updateOrganizerDisplayName(ORGANIZER))
+
+    def testKeepsConcurrentUpdates(self):
+        rename = ConferenceApi.__dict__['_renameOrganizer']
+        self.addCleanup(setattr, ConferenceApi, '_renameOrganizer', rename)
+
+        def editedMeanwhile(p_key, conf_keys):
+            # updateConference commits after the task read the page
+            conf = conf_keys[0].get()
+            conf.description = 'Edited'
+            conf.put()
+            return rename.__func__(p_key, conf_keys)
+        ConferenceApi._renameOrganizer = staticmethod(editedMeanwhile)
+
+        ConferenceApi._updateOrganizerDisplayName(ORGANIZER, batch_size=2)
+        confs = self.reread()
+        self.assertEqual(['Renamed'] * 5,
+                         [conf.organizerDisplayName for conf in confs])
+        self.assertEqual(3, [conf.description for conf in confs].count('Edited'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+"""test_query_conferences.py
+
+queryConferences pages through results with cursors, including for
+'!=' filters (which ndb runs as a merge of two queries) and for
+inequalities on two fields (one checked in memory), where the field
+stats pick the field to push and every page keeps the first page's
+choice.
+
+"""
+
+import unittest
+
+import testbase
+
+from google.appengine.api import memcache
+
+from models import ConferenceQueryForm, ConferenceQueryForms
+import fieldstats
+
+
+class QueryConferencesTest(testbase.TestCase):
+
+    def setUp(self):
+        super(QueryConferencesTest, self).setUp()
+        testbase.login('attendee@example.com')
+        for i in range(12):
+            testbase.makeConference('Conference %02d' % i,
+                                    city=['London', 'Paris'][i % 2],
+                                    month=i + 1, maxAttendees=50 * (i + 1))
+
+    def request(self, *filters, **fields):
+        return ConferenceQueryForms(filters=[
+            ConferenceQueryForm(field=field, operator=op, value=value)
+            for field, op, value in filters], **fields)
+
+    def queryAll(self, *filters, **kwargs):
+        """Return the names of every match, two per page, calling
+        betweenPages() (if given) after the first page."""
+        betweenPages = kwargs.get('betweenPages')
+        request = self.request(*filters, pageSize=2)
+        names = []
+        while True:
+            forms = self.api.queryConferences(request)
+            names.extend(form.name for form in forms.items)
+            if not forms.nextPageToken:
+                return names
+            request.pageToken = forms.nextPageToken
+            if betweenPages:
+                betweenPages()
+                betweenPages = None
+
+    def pushed(self, *filters):
+        forms = self.api.queryConferences(self.request(*filters, explain=True))
+        return forms.plan.orderBy[0]
+
+    def testNotEqualPages(self):
+        names = self.queryAll(('CITY', 'NE', 'London'))
+        self.assertEqual(['Conference %02d' % i for i in range(1, 12, 2)],
+                         sorted(names))
+
+    def testTwoInequalityFieldsPage(self):
+        names = self.queryAll(('MONTH', 'GT', '6'),
+                              ('MAX_ATTENDEES', 'LT', '500'))
+        # months 7-9 have 350-450 attendees
+        self.assertEqual(['Conference 06', 'Conference 07', 'Conference 08'],
+                         sorted(names))
+
+    def testStatsPickThePushedField(self):
+        filters = (('MONTH', 'GT', '6'), ('MAX_ATTENDEES', 'LT', '500'))
+        # no stats yet: both operators look alike, so the first field
+        self.assertEqual('maxAttendees', self.pushed(*filters))
+
+        fieldstats.refresh()
+        # month > 6 passes 6 of 12, maxAttendees < 500 passes 9 of 12
+        self.assertEqual('month', self.pushed(*filters))
+
+    def testPagesKeepTheirPlan(self):
+        filters = (('MONTH', 'GT', '6'), ('MAX_ATTENDEES', 'LT', '500'))
+
+        def restat():
+            # later pages would now push month
+            fieldstats.refresh()
+            memcache.flush_all()
+
+        self.assertEqual('maxAttendees', self.pushed(*filters))
+        names = self.queryAll(*filters, betweenPages=restat)
+        self.assertEqual('month', self.pushed(*filters))
+        self.assertEqual(['Conference 06', 'Conference 07', 'Conference 08'],
+                         sorted(names))
+
+
+if __name__ == '__main__':
+    unittest.main()
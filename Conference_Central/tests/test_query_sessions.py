@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+
+"""test_query_sessions.py
+
+querySessions filters on date & start time ranges through the Session
+properties, and checks the inequality it can't push in memory, where
+sessions with no date or start time simply don't match.
+
+"""
+
+import unittest
+from datetime import date, time
+
+import testbase
+
+from conference import SESSION_QUERY_REQUEST
+from models import Session
+
+
+class QuerySessionsTest(testbase.TestCase):
+
+    def setUp(self):
+        super(QuerySessionsTest, self).setUp()
+        testbase.login('attendee@example.com')
+        self.conf = testbase.makeConference('Agenda')
+        # 08:00 to 13:00 on two days
+        self.day1 = testbase.makeSessions(self.conf, 6, 'Day 1',
+                                          date=date(2016, 6, 1))
+        self.day2 = testbase.makeSessions(self.conf, 6, 'Day 2',
+                                          date=date(2016, 6, 2))
+        self.undated = Session(parent=self.conf.key, name='Undated',
+                               startTime=time(10))
+        self.undated.put()
+
+    def query(self, **params):
+        request = SESSION_QUERY_REQUEST.combined_message_class(**params)
+        return sorted(form.name for form in self.api.querySessions(request).items)
+
+    def testDateRange(self):
+        self.assertEqual(sorted(sesh.name for sesh in self.day2),
+                         self.query(startDate='2016-06-02', endDate='2016-06-30'))
+
+    def testTimeRange(self):
+        self.assertEqual(
+            ['Day 1 1', 'Day 1 2', 'Day 2 1', 'Day 2 2', 'Undated'],
+            self.query(startTimeFrom='09:00', startTimeTo='10:00'))
+
+    def testTimeWindowOnDates(self):
+        # startTime is pushed; the undated session fails the date check
+        self.assertEqual(
+            ['Day 1 1', 'Day 1 2', 'Day 2 1', 'Day 2 2'],
+            self.query(websafeConferenceKey=self.conf.key.urlsafe(),
+                       startDate='2016-06-01',
+                       startTimeFrom='09:00', startTimeTo='10:00'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+"""test_queryplanner.py
+
+The planner's cost model: with sampled field values it pushes the
+inequality field that passes the fewest entities, whatever its name or
+operator; without them it falls back to per-operator guesses.
+
+"""
+
+import unittest
+
+import testbase
+
+import queryplanner
+
+MONTHS = range(1, 13)
+# mostly small conferences
+SIZES = sorted([20] * 60 + [80] * 20 + [300] * 15 + [900] * 5)
+STATS = {'month': MONTHS, 'maxAttendees': SIZES}
+
+
+def filters(*spec):
+    return [{"field": field, "operator": op, "value": value}
+            for field, op, value in spec]
+
+
+class SelectivityTest(unittest.TestCase):
+
+    def testFromSample(self):
+        self.assertAlmostEqual(0.5, queryplanner.selectivity(
+            filters(('month', '>', 6)), STATS))
+        self.assertAlmostEqual(0.8, queryplanner.selectivity(
+            filters(('maxAttendees', '<', 100)), STATS))
+
+    def testRangeOnOneField(self):
+        # both ends of a range are checked against the same values
+        self.assertAlmostEqual(3 / 12.0, queryplanner.selectivity(
+            filters(('month', '>=', 4), ('month', '<', 7)), STATS))
+
+    def testNeverZero(self):
+        self.assertTrue(queryplanner.selectivity(
+            filters(('month', '>', 12)), STATS) > 0)
+
+    def testWithoutSample(self):
+        self.assertEqual(
+            queryplanner.OPERATOR_SELECTIVITY['<'],
+            queryplanner.selectivity(filters(('maxAttendees', '<', 100))))
+
+
+class PlanTest(unittest.TestCase):
+
+    def testPushesTheMostSelectiveField(self):
+        self.assertEqual('month', queryplanner.plan(filters(
+            ('month', '>', 6), ('maxAttendees', '<', 100)),
+            stats=STATS).inequality_field)
+        self.assertEqual('maxAttendees', queryplanner.plan(filters(
+            ('month', '>', 2), ('maxAttendees', '>=', 300)),
+            stats=STATS).inequality_field)
+
+    def testResidualIsTheRest(self):
+        query_plan = queryplanner.plan(filters(
+            ('city', '=', 'Paris'), ('month', '>', 6),
+            ('maxAttendees', '<', 100)), stats=STATS)
+        self.assertEqual(['city', 'month'],
+                         sorted(filtr["field"]
+                                for filtr in query_plan.datastore_filters))
+        self.assertEqual(['maxAttendees'],
+                         [filtr["field"] for filtr in query_plan.residual])
+        self.assertAlmostEqual(0.8, query_plan.residual_selectivity)
+
+    def testPushedOverride(self):
+        self.assertEqual('maxAttendees', queryplanner.plan(filters(
+            ('month', '>', 6), ('maxAttendees', '<', 100)),
+            stats=STATS, pushed='maxAttendees').inequality_field)
+        # a field with no inequality can't be pushed
+        self.assertEqual('month', queryplanner.plan(filters(
+            ('month', '>', 6), ('maxAttendees', '<', 100)),
+            stats=STATS, pushed='city').inequality_field)
+
+
+if __name__ == '__main__':
+    unittest.main()
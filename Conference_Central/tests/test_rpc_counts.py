@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+"""test_rpc_counts.py
+
+Datastore round trips per request for queryConferences and
+getConferencesToAttend must not grow with the number of conferences
+returned: one query for the keys, one batch get for the entities.
+
+"""
+
+import unittest
+
+import testbase
+
+from google.appengine.ext import ndb
+
+from conference import _refId
+from models import ConferenceQueryForm, ConferenceQueryForms
+from models import Profile, Registration
+from protorpc import message_types
+
+
+class QueryConferencesRpcTest(testbase.TestCase):
+
+    def setUp(self):
+        super(QueryConferencesRpcTest, self).setUp()
+        testbase.login('attendee@example.com')
+
+    def makeConferences(self, count, **fields):
+        return [testbase.makeConference('Conference %d' % i, **fields)
+                for i in range(count)]
+
+    def query(self):
+        request = ConferenceQueryForms(filters=[
+            ConferenceQueryForm(field='CITY', operator='EQ', value='London')])
+        with testbase.countRpcs() as rpcs:
+            forms = self.api.queryConferences(request)
+        return forms, rpcs
+
+    def testRpcsDontGrowWithResults(self):
+        self.makeConferences(2, city='London')
+        self.makeConferences(5, city='Paris')
+        forms, few = self.query()
+        self.assertEqual(2, len(forms.items))
+
+        self.makeConferences(15, city='London')
+        forms, many = self.query()
+        self.assertEqual(17, len(forms.items))
+
+        self.assertEqual(few.datastore(), many.datastore())
+        self.assertEqual(1, many.datastore('RunQuery'))
+        self.assertEqual(1, many.datastore('Get'))
+
+
+class ConferencesToAttendRpcTest(testbase.TestCase):
+
+    def setUp(self):
+        super(ConferencesToAttendRpcTest, self).setUp()
+        self.email = 'attendee@example.com'
+        testbase.login(self.email)
+        Profile(key=ndb.Key(Profile, self.email), displayName='attendee',
+                mainEmail=self.email).put()
+
+    def register(self, count):
+        p_key = ndb.Key(Profile, self.email)
+        for i in range(count):
+            conf = testbase.makeConference('Attending %d' % i)
+            Registration(key=ndb.Key(Registration, _refId(conf.key), parent=p_key),
+                         conference=conf.key).put()
+
+    def attending(self):
+        with testbase.countRpcs() as rpcs:
+            forms = self.api.getConferencesToAttend(message_types.VoidMessage())
+        return forms, rpcs
+
+    def testRpcsDontGrowWithRegistrations(self):
+        self.register(1)
+        forms, few = self.attending()
+        self.assertEqual(1, len(forms.items))
+
+        self.register(10)
+        forms, many = self.attending()
+        self.assertEqual(11, len(forms.items))
+
+        self.assertEqual(few.datastore(), many.datastore())
+        # the Profile, then the Conferences in one batch
+        self.assertEqual(2, many.datastore('Get'))
+        self.assertEqual(1, many.datastore('RunQuery'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+
+"""test_seats.py
+
+Concurrent registration against the sharded seat counter: however the
+threads interleave, a conference never takes more registrations than
+it has seats, and seats.refresh() brings seatsAvailable back in line
+with the shards. Capacity can't be cut below the registrations taken.
+
+"""
+
+import threading
+import unittest
+
+import testbase
+
+from google.appengine.api import datastore_errors
+from google.appengine.ext import ndb
+
+from conference import CONF_GET_REQUEST, CONF_POST_REQUEST
+from models import ConflictException, Registration
+import seats
+
+SEATS = 25
+USERS = 60
+THREADS = 10
+
+
+class RegistrationConcurrencyTest(testbase.TestCase):
+
+    def setUp(self):
+        super(RegistrationConcurrencyTest, self).setUp()
+        self.conf = testbase.makeConference(
+            'Popular', maxAttendees=SEATS, seatsAvailable=SEATS)
+        self.request = CONF_GET_REQUEST.combined_message_class(
+            websafeConferenceKey=self.conf.key.urlsafe())
+
+    def hammer(self, emails, call):
+        """Run call(email) for every email across THREADS threads,
+        returning {email: True, False (refused) or None (contention)}."""
+        results = {}
+        lock = threading.Lock()
+
+        def worker(batch):
+            for email in batch:
+                testbase.login(email)
+                try:
+                    result = call().data
+                except ConflictException:
+                    result = False
+                except datastore_errors.TransactionFailedError:
+                    result = None
+                with lock:
+                    results[email] = result
+
+        threads = [threading.Thread(target=worker, args=(emails[i::THREADS],))
+                   for i in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def register(self):
+        return self.api.registerForConference(self.request)
+
+    def unregister(self):
+        return self.api.unregisterFromConference(self.request)
+
+    def assertConsistent(self, registered):
+        """Shards, Registrations & (after refresh) the Conference agree."""
+        self.assertEqual(registered, Registration.query().count())
+        shards = ndb.get_multi(seats.shardKeys(self.conf.key))
+        self.assertTrue(all(shard.seats >= 0 for shard in shards))
+        self.assertEqual(SEATS - registered, sum(shard.seats for shard in shards))
+
+        self.assertEqual(SEATS - registered, seats.refresh(self.conf.key))
+        ndb.get_context().clear_cache()
+        self.assertEqual(SEATS - registered, self.conf.key.get().seatsAvailable)
+
+    def testNeverOversold(self):
+        emails = ['user%d@example.com' % i for i in range(USERS)]
+        results = self.hammer(emails, self.register)
+
+        registered = results.values().count(True)
+        self.assertTrue(registered > 0)
+        self.assertTrue(registered <= SEATS)
+        if None not in results.values():
+            # nobody lost out to contention, so every seat went
+            self.assertEqual(SEATS, registered)
+        self.assertConsistent(registered)
+
+    def testRegisterAndUnregister(self):
+        emails = ['user%d@example.com' % i for i in range(SEATS)]
+        registered = self.hammer(emails, self.register)
+        leaving = [email for email, ok in registered.items() if ok][::2]
+        left = self.hammer(leaving, self.unregister)
+
+        remaining = (registered.values().count(True) -
+                     left.values().count(True))
+        self.assertConsistent(remaining)
+
+    def testRefreshRebalancesDryShards(self):
+        shards = seats.getShards(self.conf.key)
+        for shard in shards:
+            shard.seats = 0
+        shards[0].seats = SEATS
+        ndb.put_multi(shards)
+
+        self.assertEqual(SEATS, seats.refresh(self.conf.key))
+        shards = ndb.get_multi(seats.shardKeys(self.conf.key))
+        self.assertEqual(SEATS, sum(shard.seats for shard in shards))
+        self.assertTrue(all(shard.seats > 0 for shard in shards))
+
+
+class CapacityTest(testbase.TestCase):
+
+    def setUp(self):
+        super(CapacityTest, self).setUp()
+        self.conf = testbase.makeConference(
+            'Shrinking', maxAttendees=10, seatsAvailable=10)
+        self.wsck = self.conf.key.urlsafe()
+        self.emails = ['user%d@example.com' % i for i in range(6)]
+        request = CONF_GET_REQUEST.combined_message_class(
+            websafeConferenceKey=self.wsck)
+        for email in self.emails:
+            testbase.login(email)
+            self.api.registerForConference(request)
+
+    def resize(self, maxAttendees):
+        testbase.login('organizer@example.com')
+        request = CONF_POST_REQUEST.combined_message_class(
+            websafeConferenceKey=self.wsck, maxAttendees=maxAttendees)
+        return self.api.updateConference(request)
+
+    def free(self):
+        return sum(shard.seats for shard in
+                   ndb.get_multi(seats.shardKeys(self.conf.key)))
+
+    def testCutBelowRegistrationsRefused(self):
+        self.assertRaises(ConflictException, self.resize, 5)
+        ndb.get_context().clear_cache()
+        self.assertEqual(10, self.conf.key.get().maxAttendees)
+        self.assertEqual(4, self.free())
+
+    def testCutToRegistrations(self):
+        self.assertEqual(0, self.resize(6).seatsAvailable)
+        request = CONF_GET_REQUEST.combined_message_class(
+            websafeConferenceKey=self.wsck)
+        testbase.login('late@example.com')
+        self.assertRaises(ConflictException,
+                          self.api.registerForConference, request)
+
+        # a seat given back is a seat within the new capacity
+        testbase.login(self.emails[0])
+        self.assertTrue(self.api.unregisterFromConference(request).data)
+        self.assertEqual(1, self.free())
+        self.assertEqual(6, Registration.query().count() + self.free())
+
+    def testCutBeforeShardsExist(self):
+        conf = testbase.makeConference(
+            'Unsharded', maxAttendees=10, seatsAvailable=3)
+        self.wsck = conf.key.urlsafe()
+        self.assertRaises(ConflictException, self.resize, 6)
+        self.assertEqual(1, self.resize(8).seatsAvailable)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+
+"""test_sessions_by_speaker.py
+
+getSessionsBySpeaker queries Session.speaker until the speaker backfill
+has finished, then reads the Speaker aggregates; either way a cached
+response is served without touching the datastore.
+
+"""
+
+import unittest
+
+import testbase
+
+from conference import SPEAKER_QUERY_REQUEST
+import speakers
+
+
+class SessionsBySpeakerTest(testbase.TestCase):
+
+    def setUp(self):
+        super(SessionsBySpeakerTest, self).setUp()
+        testbase.login('attendee@example.com')
+        self.conf = testbase.makeConference('Talks')
+        self.talks = testbase.makeSessions(
+            self.conf, 3, 'Talk', speaker='Jane Doe',
+            speakerKey=speakers.speakerKey('Jane Doe'))
+        testbase.makeSessions(self.conf, 2, 'Other', speaker='John Roe',
+                              speakerKey=speakers.speakerKey('John Roe'))
+
+    def bySpeaker(self, speaker, cold=True):
+        request = SPEAKER_QUERY_REQUEST.combined_message_class(speaker=speaker)
+        with testbase.countRpcs(cold) as rpcs:
+            forms = self.api.getSessionsBySpeaker(request)
+        return [form.name for form in forms.items], rpcs
+
+    def testBeforeBackfill(self):
+        names, _ = self.bySpeaker('Jane Doe')
+        self.assertEqual(['Talk 0', 'Talk 1', 'Talk 2'], sorted(names))
+        # the legacy query matches the name exactly
+        names, _ = self.bySpeaker('jane  doe')
+        self.assertEqual([], names)
+
+    def testCacheHitBeforeBackfill(self):
+        first, _ = self.bySpeaker('Jane Doe')
+        again, rpcs = self.bySpeaker('Jane Doe', cold=False)
+        self.assertEqual(first, again)
+        self.assertEqual(0, rpcs.datastore())
+
+    def testAfterBackfill(self):
+        speakers.recordConference('Jane Doe', self.conf.key)
+        speakers.markBackfilled()
+
+        names, _ = self.bySpeaker('jane  doe')
+        # in agenda order
+        self.assertEqual(['Talk 0', 'Talk 1', 'Talk 2'], names)
+
+        # name variants share the cached response
+        again, rpcs = self.bySpeaker('Jane Doe', cold=False)
+        self.assertEqual(names, again)
+        self.assertEqual(0, rpcs.datastore())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+"""test_sessions_by_type.py
+
+getConferenceSessionsByType runs ancestor + type queries, so both its
+results and the entities it reads depend on one conference's sessions,
+not on every session in the datastore.
+
+"""
+
+import unittest
+
+import testbase
+
+from conference import SESH_QUERY_REQUEST
+
+
+class SessionsByTypeTest(testbase.TestCase):
+
+    def setUp(self):
+        super(SessionsByTypeTest, self).setUp()
+        testbase.login('attendee@example.com')
+        self.conf = testbase.makeConference('Small')
+        self.other = testbase.makeConference('Big')
+
+        self.workshops = testbase.makeSessions(
+            self.conf, 3, 'Workshop', typeOfSession=['workshop'])
+        self.lectures = testbase.makeSessions(
+            self.conf, 2, 'Lecture', typeOfSession=['lecture'])
+        self.both = testbase.makeSessions(
+            self.conf, 1, 'Both', typeOfSession=['workshop', 'lecture'])
+        testbase.makeSessions(self.other, 20, 'Elsewhere',
+                              typeOfSession=['workshop'])
+
+    def byType(self, *types):
+        request = SESH_QUERY_REQUEST.combined_message_class(
+            websafeConferenceKey=self.conf.key.urlsafe(),
+            typesOfSession=list(types))
+        with testbase.countRpcs() as rpcs:
+            forms = self.api.getConferenceSessionsByType(request)
+        return forms, rpcs
+
+    def keys(self, sessions):
+        return sorted(sesh.key.urlsafe() for sesh in sessions)
+
+    def testOnlyThisConference(self):
+        forms, rpcs = self.byType('workshop')
+        self.assertEqual(self.keys(self.workshops + self.both),
+                         sorted(form.seshWebSafeKey for form in forms.items))
+        self.assertEqual(4, rpcs.entities_read)
+
+    def testReadsDontGrowWithOtherConferences(self):
+        _, before = self.byType('workshop')
+        testbase.makeSessions(self.other, 200, 'More',
+                              typeOfSession=['workshop'])
+        _, after = self.byType('workshop')
+        self.assertEqual(before.entities_read, after.entities_read)
+        self.assertEqual(before.datastore(), after.datastore())
+
+    def testSeveralTypes(self):
+        forms, rpcs = self.byType('workshop', 'lecture')
+        keys = [form.seshWebSafeKey for form in forms.items]
+        self.assertEqual(
+            self.keys(self.workshops + self.lectures + self.both), sorted(keys))
+        # one query per type, merged without duplicates
+        self.assertEqual(2, rpcs.datastore('RunQuery'))
+        self.assertEqual(len(set(keys)), len(keys))
+        # the session with both types is read by both queries
+        self.assertEqual(7, rpcs.entities_read)
+
+    def testSeveralTypesWithUndatedSessions(self):
+        undated = testbase.makeSessions(
+            self.conf, 1, 'Undated', date=None, typeOfSession=['lecture'])
+        forms, _ = self.byType('workshop', 'lecture')
+        # undated sessions sort first, as in the datastore
+        self.assertEqual(undated[0].key.urlsafe(), forms.items[0].seshWebSafeKey)
+        self.assertEqual(7, len(forms.items))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+"""test_stream_sessions.py
+
+_streamSessions yields every matching session across all conferences
+in agenda order, however many batches that takes.
+
+"""
+
+import unittest
+from datetime import date
+
+import testbase
+
+from conference import ConferenceApi, STREAM_BATCH_SIZE
+
+
+class StreamSessionsTest(testbase.TestCase):
+
+    def setUp(self):
+        super(StreamSessionsTest, self).setUp()
+        self.first = testbase.makeConference('First')
+        self.second = testbase.makeConference('Second')
+        # more than one batch between them
+        self.early = testbase.makeSessions(
+            self.first, STREAM_BATCH_SIZE, 'Early', date=date(2016, 6, 1),
+            typeOfSession=['lecture'])
+        self.late = testbase.makeSessions(
+            self.second, 30, 'Late', date=date(2016, 6, 2),
+            typeOfSession=['workshop'])
+
+    def testStreamsEveryBatch(self):
+        with testbase.countRpcs() as rpcs:
+            streamed = list(ConferenceApi._streamSessions())
+        self.assertEqual(STREAM_BATCH_SIZE + 30, len(streamed))
+        self.assertEqual(len(streamed), len(set(sesh.key for sesh in streamed)))
+        # agenda order across conferences
+        self.assertEqual(
+            sorted(streamed, key=lambda sesh: (sesh.date, sesh.startTime)),
+            streamed)
+        # the first batch comes with the query, the rest from Next calls
+        self.assertEqual(1, rpcs.datastore('RunQuery'))
+        self.assertTrue(rpcs.datastore('Next') >= 1)
+
+    def testSmallBatches(self):
+        with testbase.countRpcs() as rpcs:
+            streamed = list(ConferenceApi._streamSessions(
+                startDate=date(2016, 6, 2), batch_size=7))
+        self.assertEqual(sorted(sesh.key.urlsafe() for sesh in self.late),
+                         sorted(sesh.key.urlsafe() for sesh in streamed))
+        # 30 sessions, 7 at a time
+        self.assertTrue(rpcs.datastore('Next') >= 4)
+
+    def testFilterByType(self):
+        streamed = list(ConferenceApi._streamSessions(typeOfSession='lecture'))
+        self.assertEqual(sorted(sesh.key.urlsafe() for sesh in self.early),
+                         sorted(sesh.key.urlsafe() for sesh in streamed))
+
+
+if __name__ == '__main__':
+    unittest.main()
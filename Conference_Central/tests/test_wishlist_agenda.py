@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+
+"""test_wishlist_agenda.py
+
+getWishlistAgenda lists wishlist sessions in the same order as every
+other session listing, undated & untimed ones first, and leaves those
+out of conflicts & the suggested schedule.
+
+"""
+
+import unittest
+from datetime import date, time
+
+import testbase
+
+from google.appengine.ext import ndb
+
+from conference import WISHLIST_POST_REQUEST
+from models import Session
+from protorpc import message_types
+
+
+class WishlistAgendaTest(testbase.TestCase):
+
+    def setUp(self):
+        super(WishlistAgendaTest, self).setUp()
+        testbase.login('attendee@example.com')
+        conf = testbase.makeConference('Agenda')
+        self.sessions = dict((name, Session(
+            parent=conf.key, name=name, date=day, startTime=start,
+            duration=duration)) for name, day, start, duration in [
+                ('Later', date(2016, 6, 2), time(9), 60),
+                ('Overlap', date(2016, 6, 1), time(9, 30), 30),
+                ('Morning', date(2016, 6, 1), time(9), 60),
+                ('Untimed', date(2016, 6, 1), None, 60),
+                ('Undated', None, time(10), 60),
+            ])
+        ndb.put_multi(self.sessions.values())
+        for sesh in self.sessions.values():
+            self.api.addSessionToWishlist(
+                WISHLIST_POST_REQUEST.combined_message_class(
+                    SessionKey=sesh.key.urlsafe()))
+
+    def wskey(self, name):
+        return self.sessions[name].key.urlsafe()
+
+    def testOrder(self):
+        agenda = self.api.getWishlistAgenda(message_types.VoidMessage())
+        # as the datastore orders None, and as _streamSessions yields them
+        self.assertEqual(['Undated', 'Untimed', 'Morning', 'Overlap', 'Later'],
+                         [form.name for form in agenda.items])
+
+    def testConflicts(self):
+        agenda = self.api.getWishlistAgenda(message_types.VoidMessage())
+        self.assertEqual([[self.wskey('Morning'), self.wskey('Overlap')]],
+                         [group.seshWebSafeKeys for group in agenda.conflicts])
+        self.assertEqual([self.wskey('Morning'), self.wskey('Later')],
+                         agenda.suggested)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+
+"""testbase.py
+
+Testbed setup shared by the Conference Central tests & benchmarks.
+
+Run from Conference_Central with the App Engine SDK on PYTHONPATH, or
+GAE_SDK pointing at it (the directory holding dev_appserver.py):
+
+    python -m unittest discover -s tests
+
+The datastore stub runs with require_indexes, so the tests also check
+that index.yaml covers the queries they make.
+
+"""
+
+import collections
+import contextlib
+import os
+import sys
+import threading
+import unittest
+from datetime import date, time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+if os.environ.get('GAE_SDK'):
+    sys.path.insert(0, os.environ['GAE_SDK'])
+
+import dev_appserver
+dev_appserver.fix_sys_path()
+
+import endpoints
+from google.appengine.api import apiproxy_stub_map
+from google.appengine.api import memcache
+from google.appengine.api import users
+from google.appengine.datastore import datastore_stub_util
+from google.appengine.ext import ndb
+from google.appengine.ext import testbed
+
+from models import Conference, Profile, Session
+import displaynames
+import speakers
+
+# calls the datastore stub makes itself when it loads index.yaml
+INDEX_CALLS = ('CreateIndex', 'UpdateIndex', 'DeleteIndex', 'GetIndices')
+
+# endpoints.get_current_user() is patched to return this thread's user
+_user = threading.local()
+
+
+def login(email):
+    """Make email the signed-in user for the calling thread."""
+    _user.user = users.User(email=email) if email else None
+
+
+def currentUser():
+    return getattr(_user, 'user', None)
+
+
+def activateTestbed():
+    """Activate & return a testbed with every stub the app uses."""
+    tb = testbed.Testbed()
+    tb.activate()
+    tb.setup_env()
+    # every query sees every write, so counts don't depend on chance
+    policy = datastore_stub_util.PseudoRandomHRConsistencyPolicy(probability=1)
+    tb.init_datastore_v3_stub(consistency_policy=policy,
+                              require_indexes=True, root_path=APP_DIR)
+    tb.init_memcache_stub()
+    tb.init_taskqueue_stub(root_path=APP_DIR)
+    tb.init_user_stub()
+    tb.init_mail_stub()
+    tb.init_app_identity_stub()
+    ndb.get_context().clear_cache()
+
+    # process-wide caches would leak between tests
+    with displaynames._lock:
+        displaynames._local.clear()
+    speakers._backfilled = False
+    speakers._checked = 0
+    return tb
+
+
+class RpcCounter(object):
+    """RpcCounter -- counts API calls by (service, method), and the
+    entities the datastore returned to queries"""
+
+    def __init__(self):
+        self.calls = collections.defaultdict(int)
+        self.entities_read = 0
+
+    def record(self, service, call, request, response):
+        """Post-call hook; the SDK only accepts functions & methods."""
+        if service == 'datastore_v3' and call in INDEX_CALLS:
+            return
+        self.calls[(service, call)] += 1
+        if service == 'datastore_v3' and call in ('RunQuery', 'Next'):
+            self.entities_read += response.result_size()
+
+    def datastore(self, call=None):
+        """Return the number of datastore calls, or of one kind of call."""
+        return sum(n for (service, method), n in self.calls.iteritems()
+                   if service == 'datastore_v3' and call in (None, method))
+
+
+@contextlib.contextmanager
+def countRpcs(cold=True):
+    """Count the RPCs made in the block, as one new request: starting
+    from cold caches, or with memcache & process caches kept if cold is
+    False."""
+    ndb.get_context().clear_cache()
+    if cold:
+        memcache.flush_all()
+        with displaynames._lock:
+            displaynames._local.clear()
+
+    counter = RpcCounter()
+    hooks = apiproxy_stub_map.apiproxy.GetPostCallHooks()
+    hooks.Append('rpc_counter', counter.record)
+    try:
+        yield counter
+    finally:
+        hooks.Clear()
+
+
+def makeConference(name, organizer='organizer@example.com', **fields):
+    """Store & return a Conference organized by organizer."""
+    fields.setdefault('organizerUserId', organizer)
+    fields.setdefault('organizerDisplayName', organizer.split('@')[0])
+    conf = Conference(parent=ndb.Key(Profile, organizer), name=name, **fields)
+    conf.put()
+    return conf
+
+
+def makeSessions(conf, count, name='Session', **fields):
+    """Store & return count Sessions in conf, an hour apart."""
+    fields.setdefault('date', date(2016, 6, 1))
+    sessions = [Session(parent=conf.key, name='%s %d' % (name, i),
+                        startTime=time(8 + i % 12), **fields)
+                for i in range(count)]
+    ndb.put_multi(sessions)
+    return sessions
+
+
+class TestCase(unittest.TestCase):
+    """TestCase -- runs each test against a fresh testbed, with
+    ConferenceApi methods callable directly as self.api"""
+
+    def setUp(self):
+        self.testbed = activateTestbed()
+        self._getCurrentUser = endpoints.get_current_user
+        endpoints.get_current_user = currentUser
+        login(None)
+
+        from conference import ConferenceApi
+        self.api = ConferenceApi()
+
+    def tearDown(self):
+        endpoints.get_current_user = self._getCurrentUser
+        self.testbed.deactivate()